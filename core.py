@@ -2,17 +2,23 @@ from dis import dis
 import logging
 import random
 import heapq
+import time
 import multiprocessing
-from typing import Any, Callable, List, Optional, Sequence
+from typing import Any, Callable, List, Optional, Sequence, Set, Union
 from dataclasses import dataclass, field
 import numpy as np
 from networkx import Graph
+import graph
 from graph import Path
+from state import NetworkState, get_topology_tables
+from traffic import TrafficGenerator
 import events
 import plots
+import profiling
+import restoration_log
+import tracing
 import routing_policies
 import restoration_policies
-import xml.etree.ElementTree as ET
 
 class Environment:
 
@@ -25,7 +31,10 @@ class Environment:
             self.mean_service_holding_time: float = args.mean_service_holding_time
         else:
             self.mean_service_holding_time: float = 86400.0  # service holding time in seconds (54000 sec = 15 h)
-        self.this_disaster_services = []
+        # ids of the services disrupted by the current disaster, across the stages of its cascade
+        self.this_disaster_services: Set[int] = set()
+        self.this_disaster_restored: int = 0  # services of this_disaster_services currently restored
+        # services disrupted by the disasters of the run, each counted once per disaster
         self.adjusted_disrupted_services: int = 0
         self.failed_first:int = 0
         self.total_lost_services = 0
@@ -75,9 +84,13 @@ class Environment:
         # total number of services restored from failures
         self.number_restored_services: int = 0
 
+        # services of the disasters already over that were restored at the end of their disaster
         self.adjusted_restored: int  = 0
 
         self.number_relocated_services: int =0
+        # service and holding times of the services which already left the system, used for the availability
+        self.total_service_time: float = 0.
+        self.total_holding_time: float = 0.
         # list with all services processed
 
         self.failed_again_services: int =0
@@ -131,6 +144,17 @@ class Environment:
         if args is not None and hasattr(args, 'threads'):
             self.threads = args.threads
 
+        # stores the services of each run in a preallocated ServiceTable instead of one Service object per arrival
+        self.compact_services: bool = False
+        if args is not None and hasattr(args, 'compact_services'):
+            self.compact_services = args.compact_services
+
+        # records the time spent in each event handler and policy, see profiling.Profile
+        self.profile: bool = False
+        if args is not None and hasattr(args, 'profile'):
+            self.profile = args.profile
+        self.profiler: Optional['profiling.Profile'] = None  # profile of the replication running, if `profile`
+
         #(By Juliana)
         #intervalo stá muito grande, então quando a cascata ocorre as conexões 
         #afetadas na falha anterior já acabaram.
@@ -180,13 +204,23 @@ class Environment:
         if topology is not None:
             self.topology = topology
 
+        # resource state of links and nodes, allocated at the first reset
+        self.state: NetworkState = None
+
+        self.dc_units: int = 1800  # computing units of each DC
+
         self.seed: float = 42
         self.rng: random.Random = random.Random(42)
         if seed is not None:
             self.seed = seed
             self.rng = random.Random(seed)
+        # seed of the configuration, to which the id of each simulation (replication) is added
+        self.base_seed: float = self.seed
+        # generator of the service requests, (re)-created at reset for the current seed
+        self.traffic: TrafficGenerator = None
 
-        self.results: list = []  # initiates with an empty local results vector
+        # optional nested dict (routing policy -> restoration policy -> load -> list) where the records are appended
+        self.results: dict = None
         if results is not None:
             self.results = results
 
@@ -210,7 +244,7 @@ class Environment:
         for obs in self.tracked_statistics:
             self.tracked_results[obs] = []
 
-        self.events: list = []  # event queue
+        self.events: EventQueue = EventQueue()  # event queue
         self._processed_arrivals: int = 0
         self._rejected_services: int = 0
         self.current_time: int = 0.0
@@ -228,38 +262,16 @@ class Environment:
 
     def setup_disaster_zones(self):
         self.current_disaster_zone = []
-        self.disaster_zones_list = []
         self.links = []
-        tfpath = "config/topologies/"+self.topology_file
-        elementTree = ET.parse(tfpath)
-        root = elementTree.getroot()
-
-        for zone in root.findall(".//zone"):
-            regions_in_zone = []
-            for region in root.findall(".//zone[@id='"+zone.attrib['id']+"']/region"):
-                links = []
-                for link in root.findall(".//zone[@id='"+zone.attrib['id']+"']/region[@id='"+region.attrib['id']+"']/disaster_link"):
-                    link_tuple = []
-                    for src in root.findall(".//link[@id='"+link.text+"']/source"):
-                        link_src = src.text
-                    for tgt in root.findall(".//link[@id='"+link.text+"']/target"):
-                        link_tgt = tgt.text
-                    
-                    self.topology[link_src][link_tgt]['link_failure_probability'] = float(link.attrib['probability'])
-                    link_tuple = []
-                    link_tuple.append(link_src)
-                    link_tuple.append(link_tgt)
-                    link_tuple.append(float(link.attrib['probability']))
-                    links.append(link_tuple)
-                regions_in_zone.append(links)
-            self.disaster_zones_list.append(regions_in_zone)  
-
-        for idx, z in enumerate(self.disaster_zones_list):
-            print("Zona: ", idx+1)
-            for idx, r in enumerate(z):
-                print("Regiao ", idx)
-                print(r)
-        print("LISTA tamanho: ", len(self.disaster_zones_list))
+        # the zones are compiled once per topology; each run gets its own lists, as they are emptied while disasters happen
+        self.disaster_zones_list = [[list(region) for region in zone]
+                                    for zone in graph.get_disaster_zones(self.topology, self.topology_file)]
+
+        if tracing.disaster:
+            for idz, zone in enumerate(self.disaster_zones_list):
+                for idr, region in enumerate(zone):
+                    tracing.emit('disaster', f'Zone {idz + 1} region {idr}: {region}')
+            tracing.emit('disaster', f'{len(self.disaster_zones_list)} disaster zones')
 
         return self.disaster_zones_list
 
@@ -282,13 +294,7 @@ class Environment:
         # run here the code to summarize statistics from this specific run
         if self.plot_simulation_progress:
             plots.plot_simulation_progress(self)
-        
-        total_service_time: float = 0.
-        total_holding_time: float = 0.
-        for service in self.services:
-            if service.provisioned and service.service_time!=None:
-                total_service_time += service.service_time
-                total_holding_time += service.holding_time
+
         # add here the code to include other statistics you may want
         avg_hops_restaured_services = 0
         average_restorability = 1
@@ -315,15 +321,17 @@ class Environment:
             avg_hops_restaured_services = self.total_hops_restaured_services/self.number_restored_services
         
         if self.adjusted_disrupted_services>0:
-            adjusted_restorability += (self.adjusted_restored/self.adjusted_disrupted_services)/self.number_disaster_processed
+            # the services of the disaster still going on count as they are now
+            adjusted_restorability = (self.adjusted_restored + self.this_disaster_restored)/self.adjusted_disrupted_services
 
-        self.results[self.routing_policy.name][self.restoration_policy.name][self.load].append({
+        record = {
+            'id_simulation': self.id_simulation,
             'request_blocking_ratio': self.get_request_blocking_ratio(),
-            'average_link_usage': np.mean([self.topology[n1][n2]['utilization'] for n1, n2 in self.topology.edges()]),
-            'individual_link_usage': [self.topology[n1][n2]['utilization'] for n1, n2 in self.topology.edges()],
-            'average_node_usage': np.mean([self.topology.nodes[node]['utilization'] for node in self.topology.graph['dcs']]),
-            'individual_node_usage': {node: self.topology.nodes[node]['utilization'] for node in self.topology.graph['dcs']},
-            'average_availability': total_service_time / total_holding_time,
+            'average_link_usage': np.mean(self.state.link_utilization),
+            'individual_link_usage': self.state.link_utilization.tolist(),
+            'average_node_usage': np.mean(self.state.node_utilization[self.state.node_is_dc]),
+            'individual_node_usage': {self.topology.graph['node_names'][node]: self.state.node_utilization[node] for node in self.topology.graph['dcs']},
+            'average_availability': self.total_service_time / self.total_holding_time,
             'average_restorability': average_restorability,
             'average_relocation': average_relocation,
             'avg_loss_cost': avg_loss_cost,
@@ -350,7 +358,10 @@ class Environment:
             'total_restored_73':self.num_restored_73,
             'total_restored_15':self.num_restored_15,
             'total_restored_5':self.num_restored_5
-        })
+        }
+        if self.results is not None:
+            self.results[self.routing_policy.name][self.restoration_policy.name][self.load].append(record)
+        return record
         
     def is_empty(self, list):
         empty = 1
@@ -396,7 +407,8 @@ class Environment:
         self.num_restored_73:int =0
         self.num_restored_15:int =0
         self.num_restored_5:int =0
-        self.this_disaster_services = []
+        self.this_disaster_services = set()
+        self.this_disaster_restored = 0
         self.adjusted_restored: int  = 0
         self.adjusted_disrupted_services: int = 0
         self.failed_first:int = 0
@@ -408,7 +420,7 @@ class Environment:
         self.cascade_happened_15 = 0
         self.cascade_happened_5 = 0
         self.setup_disaster_zones()
-        self.events = []  # event queue
+        self.events = EventQueue()  # event queue
         self._processed_arrivals = 0
         self._rejected_services = 0
         self.current_time = 0.0
@@ -431,8 +443,13 @@ class Environment:
 
         self.number_relocated_services: int =0
 
+        self.total_service_time = 0.
+        self.total_holding_time = 0.
+
         # list with all services processed
         self.services: Sequence[Service] = []
+        if self.compact_services:
+            self.services = ServiceTable(self.num_arrivals + 2)
 
         for obs in self.tracked_statistics:
             self.tracked_results[obs] = []
@@ -440,44 +457,18 @@ class Environment:
         if seed is not None:
             self.seed = seed
             self.rng = random.Random(seed)
+        if seed is not None or self.traffic is None:
+            self.traffic = TrafficGenerator(int(self.seed), self.topology.graph['source_nodes'])
         if id_simulation is not None:
             self.id_simulation = id_simulation
 
         self.next_disaster_point = self.disaster_epicenter_arrivals_interval
         self.repeat_disaster = 1
 
-        # (re)-initialize the graph
-        self.topology.graph['running_services'] = []
-        for idx, lnk in enumerate(self.topology.edges()):
-            self.topology[lnk[0]][lnk[1]]['available_units'] = self.resource_units_per_link
-            self.topology[lnk[0]][lnk[1]]['total_units'] = self.resource_units_per_link
-            self.topology[lnk[0]][lnk[1]]['services'] = []
-            self.topology[lnk[0]][lnk[1]]['running_services'] = []
-            self.topology[lnk[0]][lnk[1]]['id'] = idx
-            self.topology[lnk[0]][lnk[1]]['utilization'] = 0.0
-            self.topology[lnk[0]][lnk[1]]['last_update'] = 0.0
-            self.topology[lnk[0]][lnk[1]]['link_failure_probability'] = 0
-            self.topology[lnk[0]][lnk[1]]['current_failure_probability'] = 0
-        for idx, node in enumerate(self.topology.nodes()):
-            if self.topology.nodes[node]['dc']:
-                #self.topology.nodes[node]['available_units'] = self.topology.degree(node) * self.resource_units_per_link
-                #self.topology.nodes[node]['total_units'] = self.topology.degree(node) * self.resource_units_per_link
-                self.topology.nodes[node]['available_units'] = 1800 #juliana alterou de 1800 para 100000
-                self.topology.nodes[node]['total_units'] = 1800 #juliana
-                #self.topology.nodes[node]['available_units'] = 700
-                #self.topology.nodes[node]['total_units'] = 700
-                self.topology.nodes[node]['services'] = []
-                self.topology.nodes[node]['running_services'] = []
-                self.topology.nodes[node]['id'] = idx
-                self.topology.nodes[node]['utilization'] = 0.0
-                self.topology.nodes[node]['last_update'] = 0.0
-                self.topology.nodes[node]['total_storage'] = 0
-                self.topology.nodes[node]['available_storage'] = 0
-                self.topology.nodes[node]['node_failure_probability'] =0
-            else:
-                self.topology.nodes[node]['node_failure_probability'] =0
-                self.topology.nodes[node]['available_units'] = 0
-                self.topology.nodes[node]['total_units'] = 0        
+        # (re)-initialize the network state
+        if self.state is None:
+            self.state = NetworkState(self.topology)
+        self.state.reset(self.resource_units_per_link, self.dc_units)
         
         self.setup_next_arrival()
 
@@ -488,11 +479,9 @@ class Environment:
         """
         if self._processed_arrivals > self.num_arrivals:
             return  # returns None when all arrivals have been processed
-        at = self.current_time + self.rng.expovariate(1 / self.mean_service_inter_arrival_time)
-
-        ht = self.rng.expovariate(1 / self.mean_service_holding_time)
-        src = self.rng.choice([x for x in self.topology.graph['source_nodes']])
-        src_id = self.topology.graph['node_indices'].index(src)
+        iat, ht, src, computing_units = self.traffic.next_request(self.mean_service_inter_arrival_time,
+                                                                  self.mean_service_holding_time)
+        at = self.current_time + iat
 
         #Randomly picks a class for the service
         #TODO: use self.rng
@@ -503,23 +492,15 @@ class Environment:
         if self._processed_arrivals % self.track_stats_every == 0:
             self.tracked_results['request_blocking_ratio'].append(self.get_request_blocking_ratio())
             self.tracked_results['average_link_usage']\
-                .append(np.mean([
-                    (self.topology[n1][n2]['total_units'] - self.topology[n1][n2]['available_units'])
-                    / self.topology[n1][n2]['total_units'] for n1, n2 in self.topology.edges()
-                ]))
-            self.tracked_results['average_node_usage'].append(np.mean([(self.topology.nodes[node]['total_units'] -
-                                                                        self.topology.nodes[node]['available_units']) /
-                                                                       self.topology.nodes[node]['total_units'] for node
-                                                                       in self.topology.graph['dcs']]))
+                .append(np.mean((self.state.link_total_units - self.state.link_available_units)
+                                / self.state.link_total_units))
+            dcs = self.state.node_is_dc
+            self.tracked_results['average_node_usage'].append(np.mean((self.state.node_total_units[dcs] -
+                                                                       self.state.node_available_units[dcs]) /
+                                                                      self.state.node_total_units[dcs]))
             # failure-related stats
-            total_service_time: float = 0.
-            total_holding_time: float = 0.
-            for service in self.services:
-                if service.provisioned and service.service_time is not None:  # only the services which already left the system, i.e., have a service time
-                    total_service_time += service.service_time
-                    total_holding_time += service.holding_time
-            if total_holding_time!=0:
-                self.tracked_results['average_availability'].append(total_service_time / total_holding_time)
+            if self.total_holding_time!=0:
+                self.tracked_results['average_availability'].append(self.total_service_time / self.total_holding_time)
             if self.number_disrupted_services > 0:  # avoid division by zero
                 self.tracked_results['average_restorability'].append(self.number_restored_services / self.number_disrupted_services)
                 self.tracked_results['average_relocation'].append(self.number_relocated_services / self.number_disrupted_services)
@@ -555,12 +536,12 @@ class Environment:
         if self._processed_arrivals % self.plot_tracked_stats_every == 0:
             plots.plot_simulation_progress(self)
         
-        next_arrival = Service(service_id=self._processed_arrivals, 
+        service_type = self.services.add if self.compact_services else Service
+        next_arrival = service_type(service_id=self._processed_arrivals, 
                                arrival_time=at, 
                                holding_time=ht,
                                source=src, 
-                               source_id=src_id,
-                               computing_units=random.randint(1, 5), #TODO: use self.rng
+                               computing_units=computing_units,
                                priority_class=pc,
                                service_disaster_id=None)
         #print("==passagem==")                       
@@ -569,14 +550,13 @@ class Environment:
         #print("self.number_disaster_processed ", self.number_disaster_processed)
         #print("self.number_disaster_occurences ",self.number_disaster_occurences)
         #print(">>>before >>> ", self._processed_arrivals)
-        epic_list = ['1176', '2352', '3528', '4704', '5880', '7056', '8232', '9408']
-        for epic in epic_list:
-            if self._processed_arrivals == int(epic):
-                print("DISASTER:: Breakpoint")
+        if tracing.disaster and self._processed_arrivals in (1176, 2352, 3528, 4704, 5880, 7056, 8232, 9408):
+            tracing.emit('disaster', f'Breakpoint at arrival {self._processed_arrivals}')
         #Nova condicao de entrada:
         #Conferir numero de desastres processados sem cascata
         if((self._processed_arrivals == self.next_disaster_point) and self.number_disaster_processed<self.number_disaster_occurences):       
-            print("DISASTER:: Atingiu ponto de evento")
+            if tracing.disaster:
+                tracing.emit('disaster', f'Disaster point reached at arrival {self._processed_arrivals}')
             if(self.is_empty(self.current_disaster_zone)):
                 if(self.iter_disaster<len(self.disaster_zones)-1):
                     self.iter_disaster+=1    
@@ -585,9 +565,9 @@ class Environment:
                 if len(self.aux_disaster_zone)>0:
                     for region in self.aux_disaster_zone:
                         for link in region:
-                            self.topology[link[0]][link[1]]['current_failure_probability'] = 0
-                print(self.number_disaster_processed)
-                print(self.current_disaster_zone)
+                            self.state.link_current_failure_probability[link[3]] = 0  # index 3 is the link index
+                if tracing.disaster:
+                    tracing.emit('disaster', f'Disaster {self.number_disaster_processed} in zone {self.current_disaster_zone}')
                 self.aux_disaster_zone = self.current_disaster_zone.copy()
             
             self.setup_next_disaster()
@@ -611,16 +591,18 @@ class Environment:
                 print("DISASTER:: Proxima cascata = ", self.next_disaster_point)
             '''
 
-            print("====self._processed_arrivals: ",self._processed_arrivals)
-            print("self.number_disaster_processed: ", self.number_disaster_processed)
-            print("self.disaster_epicenter_arrivals_interval: ", self.disaster_epicenter_arrivals_interval)
-            print("self.disaster_cascade_arrivals_interval: ", self.disaster_cascade_arrivals_interval)
-            print("self.next_disaster_point: ",self.next_disaster_point)       
-        if self.time_last_cascade < self.current_time:
-            self.this_disaster_services = []
-            self.adjusted_disrupted_services = 0
-            self.adjusted_restored = 0 
-        self.services.append(next_arrival)
+            if tracing.disaster:
+                tracing.emit('disaster', f'Processed arrivals: {self._processed_arrivals}\t'
+                                         f'disasters processed: {self.number_disaster_processed}\t'
+                                         f'epicenter interval: {self.disaster_epicenter_arrivals_interval}\t'
+                                         f'cascade interval: {self.disaster_cascade_arrivals_interval}\t'
+                                         f'next disaster point: {self.next_disaster_point}')
+        if self.time_last_cascade < self.current_time:  # the disaster is over
+            self.adjusted_restored += self.this_disaster_restored
+            self.this_disaster_services = set()
+            self.this_disaster_restored = 0
+        if not self.compact_services:
+            self.services.append(next_arrival)
         self.add_event(Event(next_arrival.arrival_time, events.arrival, next_arrival))
 
         #if(self.number_disaster_processed<self.number_disaster_occurences):
@@ -683,40 +665,117 @@ class Environment:
         Adds an event to the event list of the simulator.
         This implementation is based on the functionalities of heapq: https://docs.python.org/2/library/heapq.html
         :param event:
-        :return: None
+        :return: the event itself, which works as a handle to cancel it later
         """
         # self.debug("time={}; event={}".format(event.time, event.call))
-        heapq.heappush(self.events, (event.time, event))
-    
+        return self.events.push(event)
+
     def remove_service_departure(self, service) -> None:
-        for event in self.events:
-            if event[1].params == service:
-                self.events.remove(event)
-                break
+        if service.departure_event is not None:
+            self.events.cancel(service.departure_event)
+            service.departure_event = None
+
+    def release_services(self, services) -> int:
+        """
+        Releases the resources of several services and cancels their departures at once, e.g., for all the
+        services disrupted by a failure. Gives the same state and statistics as calling `release_path` and
+        `remove_service_departure` for each service in order.
+        Returns the number of departures cancelled.
+        """
+        if len(services) == 0:
+            return 0
+        for service in services:
+            self.state.node_running_services[service.destination].pop(service.service_id, None)
+            for link in service.route.links:
+                self.state.link_running_services[link].pop(service.service_id, None)
+
+        # when releasing in order, the statistics of a node or link are only updated by the first service
+        # releasing it, as the others are released at the same time, so they see only that first release
+        destinations = np.array([service.destination for service in services], dtype=np.int64)
+        computing_units = np.array([service.computing_units for service in services], dtype=np.int64)
+        nodes, first = np.unique(destinations, return_index=True)
+        others = np.ones(len(destinations), dtype=bool)
+        others[first] = False
+        self.state.node_available_units[nodes] += computing_units[first]
+        self._update_node_stats(nodes)
+        np.add.at(self.state.node_available_units, destinations[others], computing_units[others])
+
+        links = np.concatenate([service.route.links for service in services])
+        network_units = np.repeat(np.array([service.network_units for service in services], dtype=np.int64),
+                                  [len(service.route.links) for service in services])
+        unique_links, first = np.unique(links, return_index=True)
+        others = np.ones(len(links), dtype=bool)
+        others[first] = False
+        self.state.release_links(unique_links, network_units[first])
+        self._update_link_stats(unique_links)
+        self.state.release_links(links[others], network_units[others])
+        self._update_network_stats()
+
+        cancelled = self.events.cancel_many([service.departure_event for service in services
+                                             if service.departure_event is not None])
+        for service in services:
+            service.departure_event = None
+        return cancelled
+
+    def route(self, service):
+        """
+        Routes a service with the routing policy, timing the call when the replication is profiled.
+        """
+        if self.profiler is None:
+            return self.routing_policy.route(service)
+        start = time.perf_counter()
+        result = self.routing_policy.route(service)
+        self.profiler.record('route', time.perf_counter() - start)
+        return result
+
+    def restore(self, services):
+        """
+        Restores the services disrupted by a failure with the restoration policy, timing the call when
+        the replication is profiled.
+        """
+        if self.profiler is None:
+            return self.restoration_policy.restore(services)
+        start = time.perf_counter()
+        result = self.restoration_policy.restore(services)
+        self.profiler.record('restore', time.perf_counter() - start)
+        return result
 
     def provision_service(self, service):
         service.destination = service.route.node_list[-1]
-        service.destination_id = self.topology.graph['node_indices'].index(service.destination)
 
         # provisioning service at the DC
-        self.topology.nodes[service.destination]['available_units'] -= service.computing_units
-        self.topology.nodes[service.destination]['services'].append(service)
-        self.topology.nodes[service.destination]['running_services'].append(service)
+        self.state.node_available_units[service.destination] -= service.computing_units
+        self.state.node_running_services[service.destination][service.service_id] = service
         self._update_node_stats(service.destination)
 
         # provisioning the path
-        for i in range(len(service.route.node_list) - 1):
-            self.topology[service.route.node_list[i]][service.route.node_list[i + 1]]['available_units'] -= service.network_units
-            self.topology[service.route.node_list[i]][service.route.node_list[i + 1]]['services'].append(service)
-            self.topology[service.route.node_list[i]][service.route.node_list[i + 1]]['running_services'].append(service)
-            self._update_link_stats(service.route.node_list[i], service.route.node_list[i + 1])
+        links = service.route.links
+        self.state.allocate(service.route, service.network_units)
+        for link in links:
+            self.state.link_running_services[link][service.service_id] = service
+        self._update_link_stats(links)
         service.provisioned = True
 
-        self.topology.graph['running_services'].append(service)
         self._update_network_stats()
 
         # schedule departure
-        self.add_event(Event(service.arrival_time + service.holding_time, events.departure, service))
+        service.departure_event = self.add_event(Event(service.arrival_time + service.holding_time, events.departure, service))
+
+    def add_service_time(self, service):
+        """
+        Accounts the final service time of a service leaving the system, either by departing or by being dropped.
+        Must be called once per service, after its service_time is set.
+        """
+        self.total_service_time += service.service_time
+        self.total_holding_time += service.holding_time
+
+    def log_restoration(self, disrupted, restored, relocated, lost):
+        """
+        Records the outcome of the restoration of the services disrupted by a failure, see `restoration_log`.
+        """
+        restoration_log.get_restoration_log(self.output_folder).write(
+            self.current_time, self.routing_policy.name, self.restoration_policy.name, self.load, self.seed,
+            disrupted, restored, relocated, lost, self.total_expected_capacity_loss)
 
     def reject_service(self, service):
         service.provisioned = False
@@ -724,15 +783,14 @@ class Environment:
 
     def release_path(self, service):
         # provisioning service at the DC
-        self.topology.nodes[service.destination]['available_units'] += service.computing_units
-        if service in self.topology.nodes[service.destination]['running_services']:
-            self.topology.nodes[service.destination]['running_services'].remove(service)
+        self.state.node_available_units[service.destination] += service.computing_units
+        self.state.node_running_services[service.destination].pop(service.service_id, None)
         self._update_node_stats(service.destination)
-        for i in range(len(service.route.node_list) - 1):
-            self.topology[service.route.node_list[i]][service.route.node_list[i + 1]]['available_units'] += service.network_units
-            if service in self.topology[service.route.node_list[i]][service.route.node_list[i + 1]]['running_services']:
-                self.topology[service.route.node_list[i]][service.route.node_list[i + 1]]['running_services'].remove(service)
-            self._update_link_stats(service.route.node_list[i], service.route.node_list[i + 1])
+        links = service.route.links
+        self.state.release(service.route, service.network_units)
+        for link in links:
+            self.state.link_running_services[link].pop(service.service_id, None)
+        self._update_link_stats(links)
         self._update_network_stats()
 
     def setup_next_link_failure(self):
@@ -769,7 +827,7 @@ class Environment:
             at = self.current_time + self.rng.expovariate(1/self.mean_failure_inter_arrival_time)
             for region in self.current_disaster_zone:
                 for link in region:
-                    self.topology[link[0]][link[1]]['current_failure_probability'] = float(link[2]) #index 2 is probability
+                    self.state.link_current_failure_probability[link[3]] = link[2] #index 2 is probability, 3 is the link index
                     
             region_to_fail = self.current_disaster_zone[0].copy()
             self.epicenter_happened = 1
@@ -910,33 +968,34 @@ class Environment:
             disaster = DisasterFailure(links_to_fail, nodes_to_fail, at, duration)
             self.add_event(Event(disaster.arrival_time, events.disaster_arrival, disaster))
         '''
-    def _update_link_stats(self, node1, node2):
+    def _update_link_stats(self, links):
         """
         Updates link statistics following a time-weighted manner.
+        `links` can be a single link index or an array of link indices.
         """
-        last_update = self.topology[node1][node2]['last_update']
-        time_diff = self.current_time - self.topology[node1][node2]['last_update']
+        last_update = self.state.link_last_update[links]
+        time_diff = self.current_time - last_update
         if self.current_time > 0:
-            last_util = self.topology[node1][node2]['utilization']
-            cur_util = (self.resource_units_per_link - self.topology[node1][node2]['available_units']) / self.resource_units_per_link
+            last_util = self.state.link_utilization[links]
+            cur_util = (self.resource_units_per_link - self.state.link_available_units[links]) / self.resource_units_per_link
             # utilization is weighted by the time
             utilization = ((last_util * last_update) + (cur_util * time_diff)) / self.current_time
-            self.topology[node1][node2]['utilization'] = utilization
-        self.topology[node1][node2]['last_update'] = self.current_time
+            self.state.link_utilization[links] = utilization
+        self.state.link_last_update[links] = self.current_time
 
     def _update_node_stats(self, node):
         """
         Updates node statistics following a time-weighted manner.
         """
-        last_update = self.topology.nodes[node]['last_update']
-        time_diff = self.current_time - self.topology.nodes[node]['last_update']
+        last_update = self.state.node_last_update[node]
+        time_diff = self.current_time - last_update
         if self.current_time > 0:
-            last_util = self.topology.nodes[node]['utilization']
-            cur_util = (self.topology.nodes[node]['total_units'] - self.topology.nodes[node]['available_units']) / self.topology.nodes[node]['total_units']
+            last_util = self.state.node_utilization[node]
+            cur_util = (self.state.node_total_units[node] - self.state.node_available_units[node]) / self.state.node_total_units[node]
             # utilization is weighted by the time
             utilization = ((last_util * last_update) + (cur_util * time_diff)) / self.current_time
-            self.topology.nodes[node]['utilization'] = utilization
-        self.topology.nodes[node]['last_update'] = self.current_time
+            self.state.node_utilization[node] = utilization
+        self.state.node_last_update[node] = self.current_time
 
     def _update_network_stats(self):
         """
@@ -951,25 +1010,84 @@ class Environment:
 def run_simulation(env: Environment):
     """
     Launches the simulation for one particular configuration represented by the env object.
+    All the seeds of the configuration are run one after the other.
     """
-    logger = multiprocessing.log_to_stderr()
-    logger.setLevel(logging.INFO)
+    logger = multiprocessing.get_logger()
     logger.info(f'Running simulation for load {env.load} and policy {env.routing_policy.name}')
 
-    for seed in range(env.num_seeds):
-        env.reset(seed=env.seed + seed, id_simulation=seed)  # adds to the general seed
-        logger.info(f'Running simulation {seed} for policy {env.routing_policy.name} and load {env.load}')
-        while len(env.events) > 0:
-            event_tuple = heapq.heappop(env.events)
-            time = event_tuple[0]
-            env.current_time = time
-            event = event_tuple[1]
-            event.call(env, event.params)
-
-        env.compute_simulation_stats()
+    try:
+        for seed in range(env.num_seeds):
+            run_replication((env, seed))
+    finally:
+        restoration_log.merge_restoration_logs(env.output_folder)
     # prepare observations
     logger.info(f'Finishing simulation for load {env.load} and policy {env.routing_policy.name}')
 
+
+# static topology shared by all the replications run by a worker process, see `init_worker`
+_worker_topology: Graph = None
+
+
+def init_worker(topology: Union[Graph, str], trace_categories: Sequence[str] = ()):
+    """
+    Initializer of the pool processes. Keeps the topology, its k-shortest paths and its static tables
+    once per process, so that the tasks only carry the configuration of the environment.
+    The topology can also be given as the folder of its compiled bundle, which is then memory-mapped.
+    The trace categories enabled in the main process are enabled in the worker as well.
+    """
+    global _worker_topology
+    # each call adds a handler, so it is done once per process instead of once per task
+    logger = multiprocessing.log_to_stderr()
+    logger.setLevel(logging.INFO)
+    tracing.configure(trace_categories)
+    if isinstance(topology, str):
+        topology = graph.load_topology_bundle(topology)
+    _worker_topology = topology
+    get_topology_tables(topology)
+
+
+def run_replication(task):
+    """
+    Runs a single seed of the configuration represented by the env object, given as an (env, seed) tuple.
+    The result of each seed is independent of the other seeds, so replications can run in any order or process.
+    Returns the routing policy, restoration policy and load of the configuration, the record of the seed,
+    and the profile of the run as a dict (see profiling.Profile) with `env.profile`, or None otherwise.
+    The profile is kept out of the record, so it never ends up in the results of the environment.
+    """
+    env, seed = task
+    if env.topology is None:  # environments sent to a pool use the topology of the worker
+        env.topology = _worker_topology
+    logger = multiprocessing.get_logger()
+    env.reset(seed=env.base_seed + seed, id_simulation=seed)  # adds to the general seed
+    logger.info(f'Running simulation {seed} for policy {env.routing_policy.name} and load {env.load}')
+    profile = env.profiler = profiling.Profile() if env.profile else None
+    try:
+        if profile is None:
+            while len(env.events) > 0:
+                event = env.events.pop()
+                env.current_time = event.time
+                event.call(env, event.params)
+        else:
+            while len(env.events) > 0:
+                event = env.events.pop()
+                env.current_time = event.time
+                start = time.perf_counter()
+                event.call(env, event.params)
+                profile.record(event.call.__name__, time.perf_counter() - start)
+    except Exception:
+        # the last traced messages help to find what led to the error
+        # named after the configuration, as the seeds of the configurations are not unique
+        tracing.dump(f'results/{env.output_folder}/trace-{env.routing_policy.name}-{env.restoration_policy.name}'
+                     f'-{env.load}-{env.seed}.txt')
+        raise
+    finally:
+        env.profiler = None
+        restoration_log.flush_restoration_logs()
+
+    record = env.compute_simulation_stats()
+    return env.routing_policy.name, env.restoration_policy.name, env.load, record, \
+        profile.to_dict() if profile is not None else None
+
 @dataclass
 class PriorityClass:
     priority: int = 0
@@ -986,14 +1104,12 @@ class Service:
     service_id: int = field(compare=True)
     arrival_time: float
     holding_time: float
-    source: str
-    source_id: int
+    source: int
     priority_class: PriorityClass #It is the priority to restore this service
     service_disaster_id: int = None
     expected_risk: float = 0.0
     downtime: float = field(default=1800.0)
-    destination: Optional[str] = field(init=False)
-    destination_id: Optional[int] = field(init=False)
+    destination: Optional[int] = field(init=False)
     route: Optional[Path] = field(init=False)
     service_time: Optional[float] = field(init=False, default=None)
     availability: Optional[float] = field(init=False)
@@ -1003,6 +1119,7 @@ class Service:
     failed: bool = field(default=False)
     failed_before: bool = field(default=False)
     relocated: bool = field(default=False)
+    departure_event: Optional['Event'] = field(init=False, default=None)
     
     def __repr__(self) -> str:
         return f'<Service {self.service_id}, {self.source} -> {self.destination}>'
@@ -1013,6 +1130,158 @@ class Service:
             return self.service_id == other.service_id
         return False
 
+class _Column:
+    """
+    Attribute of a CompactService stored in a NumPy column of its ServiceTable.
+    Values equal to `missing` are exposed as None.
+    """
+
+    def __init__(self, missing=None):
+        self.missing = missing
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, service, owner=None):
+        if service is None:
+            return self
+        value = getattr(service.table, self.name).item(service.service_id)
+        if self.missing is not None and (value == self.missing or value != value):  # value != value for NaN
+            return None
+        return value
+
+    def __set__(self, service, value):
+        if value is None:
+            value = self.missing
+        getattr(service.table, self.name)[service.service_id] = value
+
+
+class _ObjectColumn(_Column):
+    """
+    Attribute of a CompactService that holds a Python object, e.g., the route.
+    """
+
+    def __get__(self, service, owner=None):
+        if service is None:
+            return self
+        return getattr(service.table, self.name)[service.service_id]
+
+    def __set__(self, service, value):
+        getattr(service.table, self.name)[service.service_id] = value
+
+
+class _Flag:
+    """
+    Boolean attribute of a CompactService stored as one bit of the `flags` column.
+    """
+
+    def __init__(self, bit):
+        self.bit = bit
+
+    def __get__(self, service, owner=None):
+        if service is None:
+            return self
+        return bool(service.table.flags.item(service.service_id) & self.bit)
+
+    def __set__(self, service, value):
+        if value:
+            service.table.flags[service.service_id] |= self.bit
+        else:
+            service.table.flags[service.service_id] &= 0xFF ^ self.bit
+
+
+class CompactService:
+    """
+    Lightweight handle to one row of a ServiceTable.
+    It has the same attributes as Service, so it can be used by the policies and events.
+    """
+    __slots__ = ('table', 'service_id')
+
+    arrival_time = _Column()
+    holding_time = _Column()
+    source = _Column()
+    destination = _Column(missing=-1)
+    network_units = _Column()
+    computing_units = _Column()
+    downtime = _Column()
+    expected_risk = _Column()
+    service_time = _Column(missing=np.nan)
+    availability = _Column(missing=np.nan)
+    service_disaster_id = _Column(missing=-1)
+    priority_class = _ObjectColumn()
+    route = _ObjectColumn()
+    departure_event = _ObjectColumn()
+    provisioned = _Flag(1)
+    failed = _Flag(2)
+    failed_before = _Flag(4)
+    relocated = _Flag(8)
+
+    def __init__(self, table: 'ServiceTable', service_id: int):
+        self.table = table
+        self.service_id = service_id
+
+    def __repr__(self) -> str:
+        return f'<Service {self.service_id}, {self.source} -> {self.destination}>'
+
+    def __eq__(self, other):
+        if isinstance(other, (Service, CompactService)):
+            return self.service_id == other.service_id
+        return False
+
+    __hash__ = None  # same as Service
+
+
+class ServiceTable:
+    """
+    Compact storage of all the services of one simulation run.
+    Each attribute is a preallocated NumPy column (or a list, for Python objects) addressed by the service id.
+    Services are accessed through CompactService handles, so no object needs to be kept per arrival.
+    """
+
+    def __init__(self, capacity: int):
+        self.size: int = 0  # number of services added so far
+        self.arrival_time = np.zeros(capacity, dtype=np.float64)
+        self.holding_time = np.zeros(capacity, dtype=np.float64)
+        self.source = np.zeros(capacity, dtype=np.int32)
+        self.destination = np.full(capacity, -1, dtype=np.int32)
+        self.network_units = np.ones(capacity, dtype=np.int32)
+        self.computing_units = np.ones(capacity, dtype=np.int32)
+        self.downtime = np.full(capacity, 1800.0, dtype=np.float64)
+        self.expected_risk = np.zeros(capacity, dtype=np.float64)
+        self.service_time = np.full(capacity, np.nan, dtype=np.float64)
+        self.availability = np.full(capacity, np.nan, dtype=np.float64)
+        self.service_disaster_id = np.full(capacity, -1, dtype=np.int32)
+        self.flags = np.zeros(capacity, dtype=np.uint8)
+        self.priority_class: list = [None] * capacity
+        self.route: list = [None] * capacity
+        self.departure_event: list = [None] * capacity
+
+    def add(self, service_id: int, arrival_time: float, holding_time: float, source: int,
+            priority_class: 'PriorityClass', service_disaster_id: Optional[int] = None,
+            computing_units: int = 1, network_units: int = 1) -> CompactService:
+        """
+        Stores a new service and returns its handle. Takes the same arguments as Service.
+        """
+        service = CompactService(self, service_id)
+        service.arrival_time = arrival_time
+        service.holding_time = holding_time
+        service.source = source
+        service.priority_class = priority_class
+        service.service_disaster_id = service_disaster_id
+        service.computing_units = computing_units
+        service.network_units = network_units
+        self.size = max(self.size, service_id + 1)
+        return service
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self):
+        for service_id in range(self.size):
+            if self.priority_class[service_id] is not None:  # only ids that were used
+                yield CompactService(self, service_id)
+
+
 @dataclass
 class LinkFailure:
     link_to_fail: Sequence[str]
@@ -1033,4 +1302,78 @@ class Event:
     """
     time: float
     call: Callable
-    params: Any
\ No newline at end of file
+    params: Any
+    scheduled: bool = field(default=False, compare=False)
+
+
+class EventQueue:
+    """
+    Event queue of the simulator, ordered by the time of the events.
+    Events can be cancelled using the handle returned by `push`: cancelled events
+    are only marked and stay in the heap until they reach the top, where they are
+    discarded. This keeps both `cancel` and `pop` logarithmic.
+    """
+
+    def __init__(self):
+        self._heap: list = []
+        self._counter: int = 0  # breaks ties between events with the same time
+        self._cancelled: int = 0  # number of cancelled events still in the heap
+
+    def __len__(self) -> int:
+        return len(self._heap) - self._cancelled
+
+    def push(self, event: Event) -> Event:
+        self._counter += 1
+        event.scheduled = True
+        heapq.heappush(self._heap, (event.time, self._counter, event))
+        return event
+
+    def pop(self) -> Event:
+        while len(self._heap) > 0:
+            event = heapq.heappop(self._heap)[2]
+            if not event.scheduled:  # cancelled event
+                self._cancelled -= 1
+                continue
+            event.scheduled = False
+            return event
+        raise IndexError('pop from an empty event queue')
+
+    def cancel(self, event: Event) -> bool:
+        """
+        Cancels an event previously added to the queue.
+
+        Args:
+            event (Event): The handle returned when the event was added.
+
+        Returns:
+            bool: True if the event was pending and got cancelled.
+        """
+        if not event.scheduled:
+            return False
+        event.scheduled = False
+        self._cancelled += 1
+        # rebuilds the heap when most of it is made of cancelled events
+        if self._cancelled > len(self._heap) // 2:
+            self._heap = [entry for entry in self._heap if entry[2].scheduled]
+            heapq.heapify(self._heap)
+            self._cancelled = 0
+        return True
+
+    def cancel_many(self, events: Sequence[Event]) -> int:
+        """
+        Cancels several events previously added to the queue, rebuilding the heap at most once.
+
+        Returns:
+            int: Number of events that were pending and got cancelled.
+        """
+        cancelled = 0
+        for event in events:
+            if event.scheduled:
+                event.scheduled = False
+                cancelled += 1
+        self._cancelled += cancelled
+        if self._cancelled > len(self._heap) // 2:
+            self._heap = [entry for entry in self._heap if entry[2].scheduled]
+            heapq.heapify(self._heap)
+            self._cancelled = 0
+        return cancelled
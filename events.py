@@ -1,5 +1,6 @@
 from typing import Sequence
 import typing
+import tracing
 
 if typing.TYPE_CHECKING:  # avoid circular imports
     from core import Environment, Service, LinkFailure, DisasterFailure
@@ -9,7 +10,7 @@ def arrival(env: 'Environment', service: 'Service') -> None:
     # logging.debug('Processing arrival {} for policy {} load {} seed {}'
     #               .format(service.service_id, env.policy, env.load, env.seed))
 
-    success, dc, path = env.routing_policy.route(service)
+    success, dc, path = env.route(service)
     if success:
         service.route = path
         env.provision_service(service)
@@ -23,6 +24,7 @@ def departure(env: 'Environment', service: 'Service') -> None:
     service.service_time = env.current_time - service.arrival_time
     service.service_time = service.service_time - service.downtime 
     service.availability = service.service_time / service.holding_time
+    env.add_service_time(service)
     env.release_path(service)
 
 
@@ -33,37 +35,45 @@ def link_failure_arrival(env: 'Environment', failure: 'LinkFailure') -> None:
     env.tracked_results['link_failure_arrivals'].append(env.current_time)
     
     # put the link in a failed state
-    env.topology[failure.link_to_fail[0]][failure.link_to_fail[1]]['failed'] = True
+    link = env.state.link_index[failure.link_to_fail[0], failure.link_to_fail[1]]
+    env.state.set_link_failed(link, True)
 
     # get the list of disrupted services
     services_disrupted: Sequence[Service] = []  # create an empty list
 
     # extend the list with the running services
-    services_disrupted.extend(env.topology[failure.link_to_fail[0]][failure.link_to_fail[1]]['running_services'])
+    services_disrupted.extend(env.state.drain_link_services(link))
     number_disrupted_services: int = len(services_disrupted)
 
-    env.logger.debug(f'Failure arrived at time: {env.current_time}\tLink: {failure.link_to_fail}\tfor {number_disrupted_services} services')
+    if tracing.disaster:
+        tracing.emit('disaster', f'Failure arrived at time: {env.current_time}\tLink: {failure.link_to_fail}\tfor {number_disrupted_services} services')
 
     if len(services_disrupted) > 0:
-        for service in services_disrupted:
-            # release all resources used
-            env.logger.debug(f'Releasing resources for service {service}')
-            env.release_path(service)
-
-            queue_size = len(env.events)
-            env.remove_service_departure(service)
-            if queue_size -1 != len(env.events):
-                env.logger.critical('Event not removed!')
+        # release all resources used
+        if tracing.disaster:
+            tracing.emit('disaster', f'Releasing resources for {number_disrupted_services} services')
+        if env.release_services(services_disrupted) != number_disrupted_services:
+            env.logger.critical('Event not removed!')
 
+        tracked_services = []  # services of the current disaster, which keep being tracked after its cascade
+        for service in services_disrupted:
+            if service.service_id in env.this_disaster_services:
+                tracked_services.append(service)
+                if not service.failed:
+                    env.this_disaster_restored -= 1
             # set it to a failed state
             service.failed = True
             service.relocated = False
         
-        if len(env.topology[failure.link_to_fail[0]][failure.link_to_fail[1]]['running_services']) != 0:
+        if len(env.state.link_running_services[link]) != 0:
             env.logger.critical('Not all services were removed')
         
         # call the restoration strategy
-        services_disrupted = env.restoration_policy.restore(services_disrupted)
+        services_disrupted = env.restore(services_disrupted)
+
+        for service in tracked_services:
+            if not service.failed:
+                env.this_disaster_restored += 1
 
         number_lost_services: int = 0
         number_restored_services: int = 0
@@ -82,7 +92,8 @@ def link_failure_arrival(env: 'Environment', failure: 'LinkFailure') -> None:
         # register statistics such as restorability
         if number_disrupted_services > 0:
             restorability = number_restored_services / number_disrupted_services
-            env.logger.debug(f'Failure at {env.current_time}\tRestorability: {restorability}')
+            if tracing.disaster:
+                tracing.emit('disaster', f'Failure at {env.current_time}\tRestorability: {restorability}')
         # accummulating the totals in the environment object
 
 
@@ -90,23 +101,20 @@ def link_failure_arrival(env: 'Environment', failure: 'LinkFailure') -> None:
         env.number_restored_services += number_restored_services
         env.number_relocated_services += number_relocated_services
     
-        # TODO: the code below is not thread safe and therefore might have strange formatting
-        with open("results/"+env.output_folder+"/services_restoration.txt", "a") as txt:
-            txt.write(f"\n\nTotal disrupted: \t\t\t{len(services_disrupted)}")
-            txt.write(f"\nTotal restored (relocated): {number_restored_services} ({number_relocated_services})")
-            txt.write(f"\nTotal lost: \t\t\t\t{number_lost_services}")
+        env.log_restoration(len(services_disrupted), number_restored_services, number_relocated_services, number_lost_services)
 
     env.add_event(Event(env.current_time + failure.duration, link_failure_departure, failure))
 
 def link_failure_departure(env: 'Environment', failure: 'LinkFailure') -> None:
     # in this case, only a single link failure is at the network at a given point in time
-    env.logger.debug(f'Failure repaired at time: {env.current_time}\tLink: {failure.link_to_fail}')
+    if tracing.disaster:
+        tracing.emit('disaster', f'Failure repaired at time: {env.current_time}\tLink: {failure.link_to_fail}')
 
     # tracking departures
     env.tracked_results['link_failure_departures'].append(env.current_time)
 
     # put the link back in a working state
-    env.topology[failure.link_to_fail[0]][failure.link_to_fail[1]]['failed'] = False
+    env.state.set_link_failed(env.state.link_index[failure.link_to_fail[0], failure.link_to_fail[1]], False)
 
     env.setup_next_link_failure()
 
@@ -114,9 +122,11 @@ def disaster_arrival(env: 'Environment', disaster: 'DisasterFailure') -> None:
     from core import Event
 
     env.tracked_results['link_disaster_arrivals'].append(env.current_time)
-    env.logger.debug(f'Disaster arrived at time: {env.current_time}')
+    if tracing.disaster:
+        tracing.emit('disaster', f'Disaster arrived at time: {env.current_time}')
 
     services_disrupted: Sequence[Service] = []  # create an empty list
+    disrupted_ids = set()  # a service can traverse several of the failed links
 
     #for node in disaster.nodes:
     #    env.topology.nodes[node]['failed'] = True
@@ -130,19 +140,18 @@ def disaster_arrival(env: 'Environment', disaster: 'DisasterFailure') -> None:
     number_failed_first: int = 0
     number_adjusted_disrupted_services:int = 0
     for link_failure in disaster.links:
-        env.logger.debug(f' - Link failed: {link_failure}')
-        env.topology[link_failure[0]][link_failure[1]]['failed'] = True
+        if tracing.disaster:
+            tracing.emit('disaster', f' - Link failed: {link_failure}')
+        link = env.state.link_index[link_failure[0], link_failure[1]]
+        env.state.set_link_failed(link, True)
         link_failed_services = []
-        link_failed_services.extend(env.topology[link_failure[0]][link_failure[1]]['running_services'])
+        link_failed_services.extend(env.state.drain_link_services(link))
         for failed_service in link_failed_services:
-            if failed_service not in services_disrupted:
-                
-                env.logger.debug(f'Releasing resources for service {failed_service}')
-                env.release_path(failed_service)
-                queue_size = len(env.events)
-                env.remove_service_departure(failed_service)
-                if queue_size -1 != len(env.events):
-                    env.logger.critical('Event not removed!')
+            if failed_service.service_id not in disrupted_ids:
+                disrupted_ids.add(failed_service.service_id)
+                if failed_service.service_id in env.this_disaster_services and not failed_service.failed:
+                    # restored in an earlier stage of the disaster
+                    env.this_disaster_restored -= 1
                 # set it to a failed state
                 failed_service.failed = True
                 failed_service.relocated = False
@@ -157,35 +166,38 @@ def disaster_arrival(env: 'Environment', disaster: 'DisasterFailure') -> None:
 
   
         
-        if len(env.topology[link_failure[0]][link_failure[1]]['running_services']) != 0:
+        if len(env.state.link_running_services[link]) != 0:
             env.logger.critical('Not all services were removed')
 
     #A lista deve ser convertida em um conjunto
     number_disrupted_services = len(services_disrupted)
 
+    # release all resources used, at once for all the disrupted services
+    if tracing.disaster:
+        tracing.emit('disaster', f'Releasing resources for {number_disrupted_services} services')
+    if env.release_services(services_disrupted) != number_disrupted_services:
+        env.logger.critical('Event not removed!')
+
+    # each service is tracked once per disaster, across the stages of its cascade
     this_time_disrupted_services: int=0
     for serv in services_disrupted:
-        if serv.service_disaster_id == None:
+        if serv.service_id not in env.this_disaster_services:
+            serv.service_disaster_id = len(env.this_disaster_services)
+            env.this_disaster_services.add(serv.service_id)
             this_time_disrupted_services+=1
-            env.this_disaster_services.append(serv)
-    
-    for idx, serv in enumerate(env.this_disaster_services):
-        for service in services_disrupted:
-            if serv.service_disaster_id==None:
-                service.service_disaster_id = idx
-                serv=service
 
-    # call the restoration strategy
-    services_disrupted = env.restoration_policy.restore(services_disrupted)
+    # all the services disrupted in this stage are tracked now
+    tracked_services = list(services_disrupted)
 
-    for idx, serv in enumerate(env.this_disaster_services):
-        for service in services_disrupted:
-            if service.service_disaster_id == serv.service_disaster_id:
-                serv = service
+    # call the restoration strategy
+    services_disrupted = env.restore(services_disrupted)
 
-    for serv in env.this_disaster_services:
+    # the services of the disaster that are currently restored, counted from their own state
+    for serv in tracked_services:
         if serv.failed == False:
-            env.adjusted_restored+=1
+            env.this_disaster_restored+=1
+    if env.this_disaster_restored > len(env.this_disaster_services):
+        env.logger.critical(f'{env.this_disaster_restored} services restored out of {len(env.this_disaster_services)} disrupted by the disaster')
 
     # post-process the services => compute stats
     number_lost_services: int = 0
@@ -248,7 +260,8 @@ def disaster_arrival(env: 'Environment', disaster: 'DisasterFailure') -> None:
     # accummulating the totals in the environment object
     if number_disrupted_services > 0:
         restorability = number_restored_services / number_disrupted_services
-        env.logger.debug(f'Failure at {env.current_time}\tRestorability: {restorability}')
+        if tracing.disaster:
+            tracing.emit('disaster', f'Failure at {env.current_time}\tRestorability: {restorability}')
 
     env.adjusted_disrupted_services+=this_time_disrupted_services
     env.failed_again_services += number_failed_again
@@ -266,15 +279,10 @@ def disaster_arrival(env: 'Environment', disaster: 'DisasterFailure') -> None:
     env.total_hops_relocated_services += number_hops_relocation
 
     
-    print("AECL: ")
-    print(env.total_expected_capacity_loss)  
+    if tracing.disaster:
+        tracing.emit('disaster', f'AECL: {env.total_expected_capacity_loss}')
     
-    # TODO: the code below is not thread safe and therefore might have strange formatting
-    with open("results/"+env.output_folder+"/services_restoration.txt", "a") as txt:
-        txt.write(f"\n\nTotal disrupted: \t\t\t{len(services_disrupted)}")
-        txt.write(f"\nTotal restored (relocated): {number_restored_services} ({number_relocated_services})")
-        txt.write(f"\nTotal lost: \t\t\t\t{number_lost_services}")
-        txt.write(f"\nAECL: \t\t\t\t{env.total_expected_capacity_loss}")
+    env.log_restoration(len(services_disrupted), number_restored_services, number_relocated_services, number_lost_services)
                
     env.add_event(Event(env.current_time + disaster.duration, disaster_departure, disaster))
   
@@ -286,15 +294,15 @@ def disaster_departure(env: 'Environment', disaster: 'DisasterFailure') -> None:
     env.cascade_happened_5 = 0
     env.epicenter_happened = 0
     # in this case, only a single link failure is at the network at a given point in time
-    env.logger.debug(f'Disaster repaired at time: {env.current_time} Links: {disaster.links}')
+    if tracing.disaster:
+        tracing.emit('disaster', f'Disaster repaired at time: {env.current_time} Links: {disaster.links}')
 
     # tracking departures
     env.tracked_results['link_disaster_departures'].append(env.current_time)
 
     # put the link back in a working state
     for link in disaster.links:
-        env.topology[link[0]][link[1]]['failed'] = False
-        env.topology[link[0]][link[1]]['link_failure_probability'] = 0
+        env.state.set_link_failed(env.state.link_index[link[0], link[1]], False)
 
     for node in disaster.nodes:
-        env.topology.nodes[node]['failed'] = False
\ No newline at end of file
+        env.state.set_node_failed(node, False)
\ No newline at end of file
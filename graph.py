@@ -1,11 +1,20 @@
+from functools import lru_cache
+from heapq import heappop, heappush
 from itertools import islice
 from operator import itemgetter
+import hashlib
 import math
+import multiprocessing
+import os
+import pickle
+import shutil
+import tempfile
 from xml.dom.minidom import parse
 import xml.dom.minidom
 import networkx as nx
 import numpy as np
 import xml.etree.ElementTree as ET
+import tracing
 
 
 
@@ -13,7 +22,6 @@ def get_k_shortest_paths(graph, source, target, k, weight=None):
     """
     Method from https://networkx.github.io/documentation/stable/reference/algorithms/generated/networkx.algorithms.simple_paths.shortest_simple_paths.html#networkx.algorithms.simple_paths.shortest_simple_paths
     """
-    print("teste ksp")
     return list(islice(nx.shortest_simple_paths(graph, source, target, weight=weight), k))
 
 def get_k_safest_paths(graph, source, target, k, weight=None):
@@ -21,20 +29,315 @@ def get_k_safest_paths(graph, source, target, k, weight=None):
     """
     Method from https://networkx.github.io/documentation/stable/reference/algorithms/generated/networkx.algorithms.simple_paths.shortest_simple_paths.html#networkx.algorithms.simple_paths.shortest_simple_paths
     """
-    print("graph:get_k_safest_paths")
-    print(source, "--", target)
     return list(islice(nx.shortest_simple_paths(graph, source, target, weight='link_failure_probability'), k))
     #return list(islice(nx.shortest_simple_paths(graph, source, target, weight=weight), k))
 
+class KShortestPaths:
+    """
+    Yen's k-shortest simple paths over a CSR adjacency built once from the topology.
+    It follows `networkx.shortest_simple_paths` step by step (bidirectional BFS for hops, bidirectional
+    Dijkstra for the `length` and `link_failure_probability` weights, same neighbour order and tie-breaking),
+    so both return the same paths in the same order.
+    The search state lives in per-node arrays that are reused by every search, and entries are only
+    considered set when stamped with the number of the current search, so they never need clearing.
+    Nodes must be identified by the integer ids 0..n-1.
+    """
+
+    def __init__(self, topology, weight=None):
+        self.weight = weight
+        num_nodes = topology.number_of_nodes()
+        # edges are numbered in the order of topology.edges(), like the `id` attribute
+        self.edge_ids = {}
+        for idx, (n1, n2) in enumerate(topology.edges()):
+            self.edge_ids[n1, n2] = idx
+            self.edge_ids[n2, n1] = idx
+        indptr, indices, weights, edges = [0], [], [], []
+        for node in range(num_nodes):
+            for neighbour, data in topology.adj[node].items():  # same order as networkx
+                indices.append(neighbour)
+                weights.append(1 if weight is None else float(data.get(weight, 1)))
+                edges.append(self.edge_ids[node, neighbour])
+            indptr.append(len(indices))
+        self.indptr = np.array(indptr, dtype=np.int64)
+        self.indices = np.array(indices, dtype=np.int64)
+        self.weights = np.array(weights, dtype=np.float64)
+        self.edges = np.array(edges, dtype=np.int64)
+        # neighbours of each node as (node, weight, edge) tuples, which is the fastest to iterate in Python
+        self._neighbours = [list(zip(indices[indptr[node]:indptr[node + 1]],
+                                     weights[indptr[node]:indptr[node + 1]],
+                                     edges[indptr[node]:indptr[node + 1]])) for node in range(num_nodes)]
+        self._edge_weights = {}
+        for node in range(num_nodes):
+            for neighbour, edge_weight, _ in self._neighbours[node]:
+                self._edge_weights[node, neighbour] = edge_weight
+
+        # workspace shared by all the searches
+        self._stamp = 0
+        self._ignore_stamp = 0
+        self._ignored_node = [0] * num_nodes
+        self._ignored_edge = [0] * len(self.edge_ids)
+        self._reached = [[0] * num_nodes, [0] * num_nodes]  # seen by the forward/backward search
+        self._done = [[0] * num_nodes, [0] * num_nodes]  # final distance found by the forward/backward search
+        self._distance = [[0] * num_nodes, [0] * num_nodes]
+        self._previous = [[-1] * num_nodes, [-1] * num_nodes]  # towards the source/target
+
+    def get(self, source, target, k):
+        """
+        Returns up to k shortest simple paths from source to target, as lists of node ids.
+        Raises networkx.NetworkXNoPath if the nodes are not connected.
+        """
+        shortest_path = self._bidirectional_bfs if self.weight is None else self._bidirectional_dijkstra
+        paths = []
+        candidates = []  # heap of (length, counter, path)
+        candidate_set = set()
+        counter = 0
+        previous_path = None
+        while len(paths) < k:
+            if previous_path is None:
+                self._ignore_stamp += 1
+                found = shortest_path(source, target)
+                if found is None:
+                    raise nx.NetworkXNoPath(f"No path between {source} and {target}.")
+                heappush(candidates, (found[0], counter, found[1]))
+                candidate_set.add(tuple(found[1]))
+                counter += 1
+            else:
+                self._ignore_stamp += 1
+                ignore_stamp = self._ignore_stamp
+                for i in range(1, len(previous_path)):
+                    root = previous_path[:i]
+                    root_length = self._get_length(root)
+                    for path in paths:
+                        if path[:i] == root:
+                            self._ignored_edge[self.edge_ids[path[i - 1], path[i]]] = ignore_stamp
+                    found = shortest_path(root[-1], target)
+                    if found is not None:
+                        path = root[:-1] + found[1]
+                        if tuple(path) not in candidate_set:
+                            heappush(candidates, (root_length + found[0], counter, path))
+                            candidate_set.add(tuple(path))
+                            counter += 1
+                    self._ignored_node[root[-1]] = ignore_stamp
+            if not candidates:
+                break
+            path = heappop(candidates)[2]
+            candidate_set.remove(tuple(path))
+            paths.append(path)
+            previous_path = path
+        return paths
+
+    def _get_length(self, path):
+        if self.weight is None:
+            return len(path)  # networkx measures unweighted paths by their number of nodes
+        return sum(self._edge_weights[path[i], path[i + 1]] for i in range(len(path) - 1))
+
+    def _bidirectional_bfs(self, source, target):
+        ignored_node, ignored_edge, ignore_stamp = self._ignored_node, self._ignored_edge, self._ignore_stamp
+        if ignored_node[source] == ignore_stamp or ignored_node[target] == ignore_stamp:
+            return None
+        if source == target:
+            return 1, [source]
+        self._stamp += 1
+        stamp = self._stamp
+        neighbours = self._neighbours
+        reached_forward, reached_backward = self._reached
+        previous, following = self._previous
+        reached_forward[source] = stamp
+        previous[source] = -1
+        reached_backward[target] = stamp
+        following[target] = -1
+        forward_fringe = [source]
+        reverse_fringe = [target]
+        meeting = -1
+        while forward_fringe and reverse_fringe and meeting < 0:
+            if len(forward_fringe) <= len(reverse_fringe):
+                this_level = forward_fringe
+                forward_fringe = []
+                for v in this_level:
+                    for w, _, edge in neighbours[v]:
+                        if ignored_node[w] == ignore_stamp or ignored_edge[edge] == ignore_stamp:
+                            continue
+                        if reached_forward[w] != stamp:
+                            forward_fringe.append(w)
+                            reached_forward[w] = stamp
+                            previous[w] = v
+                        if reached_backward[w] == stamp:
+                            meeting = w
+                            break
+                    if meeting >= 0:
+                        break
+            else:
+                this_level = reverse_fringe
+                reverse_fringe = []
+                for v in this_level:
+                    for w, _, edge in neighbours[v]:
+                        if ignored_node[w] == ignore_stamp or ignored_edge[edge] == ignore_stamp:
+                            continue
+                        if reached_backward[w] != stamp:
+                            following[w] = v
+                            reverse_fringe.append(w)
+                            reached_backward[w] = stamp
+                        if reached_forward[w] == stamp:
+                            meeting = w
+                            break
+                    if meeting >= 0:
+                        break
+        if meeting < 0:
+            return None
+        path = self._trace(previous, meeting)
+        path.reverse()
+        path.extend(self._trace(following, meeting)[1:])
+        return len(path), path
+
+    def _bidirectional_dijkstra(self, source, target):
+        ignored_node, ignored_edge, ignore_stamp = self._ignored_node, self._ignored_edge, self._ignore_stamp
+        if ignored_node[source] == ignore_stamp or ignored_node[target] == ignore_stamp:
+            return None
+        if source == target:
+            return 0, [source]
+        self._stamp += 1
+        stamp = self._stamp
+        neighbours = self._neighbours
+        reached, done, distance, previous = self._reached, self._done, self._distance, self._previous
+        reached[0][source] = stamp
+        distance[0][source] = 0
+        previous[0][source] = -1
+        reached[1][target] = stamp
+        distance[1][target] = 0
+        previous[1][target] = -1
+        fringe = ([(0, 0, source)], [(0, 1, target)])
+        counter = 2
+        final_path = []
+        total_distance = None
+        direction = 1
+        while fringe[0] and fringe[1]:
+            direction = 1 - direction
+            dist, _, v = heappop(fringe[direction])
+            if done[direction][v] == stamp:
+                continue
+            done[direction][v] = stamp
+            if done[1 - direction][v] == stamp:
+                return total_distance, final_path
+            this_reached, this_distance, this_previous = reached[direction], distance[direction], previous[direction]
+            this_done, this_fringe = done[direction], fringe[direction]
+            for w, weight, edge in neighbours[v]:
+                if ignored_node[w] == ignore_stamp or ignored_edge[edge] == ignore_stamp:
+                    continue
+                length = dist + weight
+                if this_done[w] == stamp:
+                    continue
+                if this_reached[w] != stamp or length < this_distance[w]:
+                    this_reached[w] = stamp
+                    this_distance[w] = length
+                    heappush(this_fringe, (length, counter, w))
+                    counter += 1
+                    this_previous[w] = v
+                    if reached[0][w] == stamp and reached[1][w] == stamp:
+                        candidate_distance = distance[0][w] + distance[1][w]
+                        if not final_path or total_distance > candidate_distance:
+                            total_distance = candidate_distance
+                            final_path = self._trace(previous[0], w)
+                            final_path.reverse()
+                            final_path.extend(self._trace(previous[1], w)[1:])
+        return None
+
+    @staticmethod
+    def _trace(previous, node):
+        # nodes from `node` back to the start of the search
+        path = []
+        while node >= 0:
+            path.append(node)
+            node = previous[node]
+        return path
+
+
 def get_path_weight(graph, path, weight):
     return np.sum([graph[path[i]][path[i+1]][weight] for i in range(len(path) - 1)])
 
 class Path:
 
-    def __init__(self, node_list, length):
+    def __init__(self, node_list, length, nodes=None, links=None):
         self.node_list = node_list
         self.length = length
         self.hops = len(node_list) - 1
+        # indices of the nodes and links of the path, used to index the network state arrays
+        self.nodes = _read_only(nodes)
+        self.links = _read_only(links)
+        self.id = None  # position in topology.graph['paths'], if the path is part of the k-shortest paths
+
+
+def _read_only(indices):
+    if indices is None:
+        return None
+    # int64 arrays are not copied, e.g., slices of the memory-mapped tables of a topology bundle
+    indices = np.asarray(indices, dtype=np.int64)
+    if indices.flags.writeable:
+        indices = indices.view()
+        indices.flags.writeable = False
+    return indices
+
+
+class CandidateTable:
+    """
+    All the (DC, path) candidates from one source node, packed into arrays so that
+    they can be evaluated against the network state at once.
+    Candidates follow the order of topology.graph['dcs'] and then of the k paths.
+    Node and link indices are padded by repeating the last index of each path,
+    which does not change min/max/any reductions over a row.
+    """
+
+    def __init__(self, dcs, dc_indices, paths):
+        self.dcs = dcs  # DC of each candidate
+        self.paths = paths  # Path of each candidate
+        self.dc_indices = np.array(dc_indices, dtype=np.int64)
+        self.path_ids = np.array([path.id for path in paths], dtype=np.int64)
+        self.hops = np.array([path.hops for path in paths], dtype=np.int64)
+        self.nodes = pad_indices([path.nodes for path in paths])
+        self.links = pad_indices([path.links for path in paths])
+        # (DC, DC index, path) of all candidates sorted by hop count, used by first-fit routing;
+        # the sort is stable, so ties keep the DC/path order
+        self.by_hops = [(dcs[idx], dc_indices[idx], paths[idx]) for idx in np.argsort(self.hops, kind='stable')]
+
+    def __len__(self):
+        return len(self.paths)
+
+
+def pad_indices(rows):
+    """
+    Packs index arrays of different lengths into a matrix, repeating the last index of each row.
+    """
+    width = max((len(row) for row in rows), default=0)
+    table = np.zeros((len(rows), width), dtype=np.int64)
+    for idx, row in enumerate(rows):
+        table[idx, :len(row)] = row
+        table[idx, len(row):] = row[-1]
+    table.flags.writeable = False
+    return table
+
+
+def get_candidates(topology):
+    """
+    Builds the candidate table of each source node from the k-shortest paths.
+    """
+    candidates = {}
+    for source in topology.graph['source_nodes']:
+        dcs, dc_indices, paths = [], [], []
+        for dc in topology.graph['dcs']:
+            for path in topology.graph['ksp'][source, dc]:
+                dcs.append(dc)
+                dc_indices.append(dc)
+                paths.append(path)
+        candidates[source] = CandidateTable(dcs, dc_indices, paths)
+    return candidates
+
+
+def get_path_indices(topology, path):
+    """
+    Returns the node and link indices of a path given as a list of node ids.
+    """
+    nodes = list(path)
+    links = [topology[path[i]][path[i + 1]]['id'] for i in range(len(path) - 1)]
+    return nodes, links
 
 
 def calculate_geographical_distance(latlong1, latlong2):
@@ -55,8 +358,21 @@ def calculate_geographical_distance(latlong1, latlong2):
     return length
 
 
+def add_named_node(graph, node_name, **attr):
+    """
+    Adds a node identified by the next dense integer id, keeping its name in
+    `graph.graph['node_names']` (id to name) and `graph.graph['node_ids']` (name to id).
+    Names should only be needed when reading topology files and for plots and result files.
+    """
+    node = len(graph.graph['node_names'])
+    graph.graph['node_names'].append(node_name)
+    graph.graph['node_ids'][node_name] = node
+    graph.add_node(node, **attr)
+    return node
+
+
 def read_sndlib_topology(file):
-    graph = nx.Graph()
+    graph = nx.Graph(node_names=[], node_ids={})
 
     with open('config/topologies/' + file) as file:
         tree = xml.dom.minidom.parse(file)
@@ -68,26 +384,23 @@ def read_sndlib_topology(file):
         for node in nodes:
             x = node.getElementsByTagName("x")[0]
             y = node.getElementsByTagName("y")[0]
-            graph.add_node(node.getAttribute("id"), pos=((float(x.childNodes[0].data), float(y.childNodes[0].data))), failed=False)
+            add_named_node(graph, node.getAttribute("id"), pos=((float(x.childNodes[0].data), float(y.childNodes[0].data))), failed=False)
         links = document.getElementsByTagName("link")
         for idx, link in enumerate(links):
-            source = link.getElementsByTagName("source")[0]
-            target = link.getElementsByTagName("target")[0]
+            source = graph.graph['node_ids'][link.getElementsByTagName("source")[0].childNodes[0].data]
+            target = graph.graph['node_ids'][link.getElementsByTagName("target")[0].childNodes[0].data]
 
             if graph.graph["coordinatesType"] == "geographical":
-                length = np.around(calculate_geographical_distance(graph.nodes[source.childNodes[0].data]["pos"], graph.nodes[target.childNodes[0].data]["pos"]), 3)
+                length = np.around(calculate_geographical_distance(graph.nodes[source]["pos"], graph.nodes[target]["pos"]), 3)
             else:
-                latlong1 = graph.nodes[source.childNodes[0].data]["pos"]
-                latlong2 = graph.nodes[target.childNodes[0].data]["pos"]
+                latlong1 = graph.nodes[source]["pos"]
+                latlong2 = graph.nodes[target]["pos"]
                 length = np.around(math.sqrt((latlong1[0] - latlong2[0]) ** 2 + (latlong1[1] - latlong2[1]) ** 2), 3)
             
             weight = 1.0
-            graph.add_edge(source.childNodes[0].data, target.childNodes[0].data,
+            graph.add_edge(source, target,
                            id=link.getAttribute("id"), weight=weight, length=length, index=idx,
                            failed=False)
-    graph.graph["node_indices"] = []
-    for idx, node in enumerate(graph.nodes()):
-        graph.graph["node_indices"].append(node)
 
     for idx, lnk in enumerate(graph.edges()):
         graph[lnk[0]][lnk[1]]['link_failure_probability'] = 0
@@ -95,7 +408,7 @@ def read_sndlib_topology(file):
 
 
 def read_txt_file(file, topology_name):
-    graph = nx.Graph(name=topology_name)
+    graph = nx.Graph(name=topology_name, node_names=[], node_ids={})
     nNodes = 0
     nLinks = 0
     with open('config/topologies/' + file, 'r') as nodes_lines:
@@ -106,15 +419,17 @@ def read_txt_file(file, topology_name):
                 line = line_full.strip()
             if idx > 2 and idx <= nNodes + 2: # skip title line
                 info = line.replace("\n", "").replace(',', '.').split("\t")
-                graph.add_node(info[0], name=info[1], pos=(float(info[2]), float(info[3])))
+                add_named_node(graph, info[0], name=info[1], pos=(float(info[2]), float(info[3])))
             elif idx > 2 + nNodes and idx <= 2 + nNodes + nLinks: # skip title line
                 info = line.replace("\n", "").split("\t")
-                n1 = graph.nodes[info[1]]
-                n2 = graph.nodes[info[2]]
+                source = graph.graph['node_ids'][info[1]]
+                target = graph.graph['node_ids'][info[2]]
+                n1 = graph.nodes[source]
+                n2 = graph.nodes[target]
                 dist = calculate_geographical_distance(n1['pos'], n2['pos'])
                 # print(n1['name'], n1['pos'], n2['name'], n2['pos'], '{:.2f}'.format(dist), info[3])
                 final_distance = float('{:.2f}'.format(max(dist, float(info[3]))))
-                graph.add_edge(info[1], info[2], id=int(info[0]), weight=1.0, length=final_distance, index=idx-2, failed=False)
+                graph.add_edge(source, target, id=int(info[0]), weight=1.0, length=final_distance, index=idx-2, failed=False)
             elif idx == 1:
                 nNodes = int(line)
             elif idx == 2:
@@ -130,6 +445,10 @@ def get_topology(args):
     else:
         raise ValueError(f'Supplied topology  `{args.topology_file}` is unknown')
     topology = set_failure_probabilities(args, topology)
+    topology.graph["node_indices"] = list(topology.nodes())
+    # links are identified by their position in the list of edges
+    for idx, lnk in enumerate(topology.edges()):
+        topology[lnk[0]][lnk[1]]['id'] = idx
     return topology
 
 def get_dcs(args, topology):
@@ -141,9 +460,9 @@ def get_dcs(args, topology):
             node = degree[i][0]
             topology.graph['dcs'].append(node)
             topology.nodes[node]['dc'] = True
-            print(node)
 
-        print(topology.graph['dcs'])
+        if tracing.ksp:
+            tracing.emit('ksp', f"DCs placed by degree: {[topology.graph['node_names'][node] for node in topology.graph['dcs']]}")
         for i in range(args.num_dcs, topology.number_of_nodes()):
             node = degree[i][0]
             topology.graph['source_nodes'].append(node)
@@ -154,7 +473,7 @@ def get_dcs(args, topology):
         #,"Seattle", "San_Francisco",  "Denver",   "Charleston", "Ithaca" ,"Los_Angeles","New_Orleans", "Washington_DC", "El_Paso","Columbus" " 
         dc_nodes = ["Salt_Lake_City", "Birmingham", "Bismarck"]  # list of datacenters
         for node in topology.nodes():  # iterate over all nodes
-            if node in dc_nodes:
+            if topology.graph['node_names'][node] in dc_nodes:
                 topology.graph['dcs'].append(node)
                 topology.nodes[node]['dc'] = True
             else:
@@ -165,54 +484,369 @@ def get_dcs(args, topology):
         raise ValueError('Selected args.dc_placement not correct!')
 
 
+# folder where the path tables are cached between runs, and version of the cached format
+KSP_CACHE_FOLDER = 'cache/ksp'
+KSP_CACHE_VERSION = 1
+
+
+def get_path_table_key(args, topology, weight):
+    """
+    Returns the cache key of the path table of a topology, which is a hash of the topology file
+    (including its failure probabilities), the number of paths, the DCs and the path weight.
+    """
+    digest = hashlib.sha256()
+    with open('config/topologies/' + args.topology_file, 'rb') as file:
+        digest.update(file.read())
+    dcs = sorted(topology.graph['node_names'][dc] for dc in topology.graph['dcs'])
+    digest.update(repr((KSP_CACHE_VERSION, args.k_paths, dcs, weight)).encode())
+    return digest.hexdigest()
+
+
+# below this number of (source, DC) pairs, paths are computed in the main process
+KSP_PARALLEL_MIN_PAIRS = 256
+
+# KSP engine and number of paths of a path-table worker process, see `_init_path_table_worker`
+_worker_ksp: KShortestPaths = None
+_worker_k_paths: int = None
+
+
+def _init_path_table_worker(topology, weight, k_paths):
+    global _worker_ksp, _worker_k_paths
+    _worker_ksp = KShortestPaths(topology, weight)
+    _worker_k_paths = k_paths
+
+
+def _compute_path_chunk(pairs):
+    return [_worker_ksp.get(n1, n2, _worker_k_paths) for n1, n2 in pairs]
+
+
+def compute_path_table(args, topology, weight):
+    """
+    Computes the k shortest paths, as lists of node ids, from every source node to every DC.
+    With more than one thread (`args.threads`) and enough pairs, chunks of (source, DC) pairs are
+    computed by a pool of processes. Chunks are merged in the pair order, so the table is the same.
+    """
+    pairs = [(n1, n2) for n1 in topology.graph['source_nodes'] for n2 in topology.graph['dcs']]
+    threads = getattr(args, 'threads', 1)
+    if threads > 1 and len(pairs) >= KSP_PARALLEL_MIN_PAIRS:
+        chunk_size = math.ceil(len(pairs) / (4 * threads))  # a few chunks per process to balance the load
+        chunks = [pairs[i:i + chunk_size] for i in range(0, len(pairs), chunk_size)]
+        with multiprocessing.Pool(processes=threads, initializer=_init_path_table_worker,
+                                  initargs=(topology, weight, args.k_paths)) as pool:
+            paths = [chunk_paths for chunk in pool.map(_compute_path_chunk, chunks) for chunk_paths in chunk]
+    else:
+        ksp = KShortestPaths(topology, weight)
+        paths = [ksp.get(n1, n2, args.k_paths) for n1, n2 in pairs]
+    return dict(zip(pairs, paths))
+
+
+def get_path_table(args, topology, weight=None):
+    """
+    Returns the path table of the topology for the given weight (None for hops), reading it from the
+    cache folder when available. Tables are written atomically, so concurrent runs can share the cache.
+    The cache can be disabled with `args.ksp_cache = False`.
+    """
+    if not getattr(args, 'ksp_cache', True):
+        return compute_path_table(args, topology, weight)
+    file_name = os.path.join(KSP_CACHE_FOLDER, get_path_table_key(args, topology, weight) + '.pkl')
+    try:
+        with open(file_name, 'rb') as file:
+            return pickle.load(file)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        pass  # not cached yet (or unreadable), computed below
+    if tracing.ksp:
+        tracing.emit('ksp', f'Computing the path table for weight {weight} into {file_name}')
+    path_table = compute_path_table(args, topology, weight)
+    os.makedirs(KSP_CACHE_FOLDER, exist_ok=True)
+    # the table is written to a temporary file first and then moved, so readers never see a partial file
+    fd, temp_file_name = tempfile.mkstemp(dir=KSP_CACHE_FOLDER, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            pickle.dump(path_table, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_file_name, file_name)
+    except BaseException:
+        os.remove(temp_file_name)
+        raise
+    return path_table
+
+
 def get_ksp(args, topology):
-    print("teste passagem ksp")
     k_shortest_paths = {}
+    path_table = get_path_table(args, topology)
 
     for idn1, n1 in enumerate(topology.graph['source_nodes']):
         for idn2, n2 in enumerate(topology.graph['dcs']):
-            paths = get_k_shortest_paths(topology, n1, n2, args.k_paths)
+            paths = path_table[n1, n2]
             lengths = [get_path_weight(topology, path, 'length') for path in paths]
             objs = []
             for path, length in zip(paths, lengths):
-                objs.append(Path(path, length))
+                objs.append(Path(path, length, *get_path_indices(topology, path)))
             # both directions have the same paths, i.e., bidirectional symmetrical links
             k_shortest_paths[n1, n2] = objs
             k_shortest_paths[n2, n1] = objs
+    return set_ksp(topology, k_shortest_paths)
+
+
+def set_ksp(topology, k_shortest_paths):
+    """
+    Sets the k-shortest paths of the topology, giving an id to every distinct path and building the candidate tables.
+    """
     topology.graph['ksp'] = k_shortest_paths
+    # every distinct path gets an id, used by the network state to track its bottleneck
+    topology.graph['paths'] = []
+    for objs in k_shortest_paths.values():
+        for path in objs:
+            if path.id is None:
+                path.id = len(topology.graph['paths'])
+                topology.graph['paths'].append(path)
+    topology.graph['candidates'] = get_candidates(topology)
     return topology
 
 def get_probability_ksp(args, topology):
-    print("passa ")
     k_shortest_paths = {}
+    path_table = get_path_table(args, topology, 'link_failure_probability')
     
     for idn1, n1 in enumerate(topology.graph['source_nodes']):
         for idn2, n2 in enumerate(topology.graph['dcs']):
-            print("chama === ",args.k_paths)
-            paths = get_k_safest_paths(topology, n1, n2, args.k_paths)
-            print("retorna s_safest")
+            paths = path_table[n1, n2]
             lengths = [get_path_weight(topology, path, 'link_failure_probability') for path in paths]
             objs = []
             for path, length in zip(paths, lengths):
-                objs.append(Path(path, length))
+                objs.append(Path(path, length, *get_path_indices(topology, path)))
             # both directions have the same paths, i.e., bidirectional symmetrical links
             k_shortest_paths[n1, n2] = objs
             k_shortest_paths[n2, n1] = objs
     topology.graph['prob_ksp'] = k_shortest_paths
     return topology
 
+def read_zone_table(topology_file):
+    """
+    Reads the links and the disaster zones of an SNDlib topology file in a single streaming pass.
+    Returns a dict from link id to the (source, target) names of the link, and the zones as tuples
+    of regions, each a tuple of (link id, probability) tuples.
+    The result is cached per process until the file is modified, and should not be modified.
+    """
+    path = 'config/topologies/' + topology_file
+    return _read_zone_table(path, os.path.getmtime(path))
+
+
+@lru_cache(maxsize=None)
+def _read_zone_table(path, mtime):
+    links = {}
+    zones = []
+    region = None  # region being read, as only links inside regions are part of the zones
+    link_id = source = target = None
+    for event, element in ET.iterparse(path, events=('start', 'end')):
+        if event == 'start':
+            if element.tag == 'link':
+                link_id = element.get('id')
+            elif element.tag == 'zone':
+                zones.append([])
+            elif element.tag == 'region':
+                region = []
+                zones[-1].append(region)
+        elif element.tag == 'source':
+            source = element.text
+        elif element.tag == 'target':
+            target = element.text
+        elif element.tag == 'link':
+            links[link_id] = (source, target)
+            element.clear()  # the elements already read are not needed, which bounds the memory of large files
+        elif element.tag == 'region':
+            region = None
+            element.clear()
+        elif element.tag == 'disaster_link':
+            if region is not None:
+                region.append((element.text, float(element.get('probability'))))
+            element.clear()
+        elif element.tag in ('node', 'zone'):
+            element.clear()
+    return links, tuple(tuple(tuple(region) for region in zone) for zone in zones)
+
+
+def get_disaster_zones(topology, topology_file):
+    """
+    Returns the disaster zones of the topology as tuples of regions, each a tuple of
+    (source id, target id, probability, link index) tuples, one for each link of the region.
+    The table is compiled once and kept in `topology.graph['disaster_zones']`.
+    """
+    if 'disaster_zones' not in topology.graph:
+        links, zones = read_zone_table(topology_file)
+        node_ids = topology.graph['node_ids']
+        compiled_zones = []
+        for zone in zones:
+            compiled_regions = []
+            for region in zone:
+                compiled_links = []
+                for link_id, probability in region:
+                    source, target = node_ids[links[link_id][0]], node_ids[links[link_id][1]]
+                    compiled_links.append((source, target, probability, topology[source][target]['id']))
+                compiled_regions.append(tuple(compiled_links))
+            compiled_zones.append(tuple(compiled_regions))
+        topology.graph['disaster_zones'] = tuple(compiled_zones)
+    return topology.graph['disaster_zones']
+
+
 def set_failure_probabilities(args,topology):
-    tf: str = args.topology_file
-    tfpath = "config/topologies/"+tf
-    elementTree = ET.parse(tfpath)
-    root = elementTree.getroot()
-
-    for zone in root.findall(".//zone"):
-        for region in root.findall(".//zone[@id='"+zone.attrib['id']+"']/region"):
-            for link in root.findall(".//zone[@id='"+zone.attrib['id']+"']/region[@id='"+region.attrib['id']+"']/disaster_link"):
-                for src in root.findall(".//link[@id='"+link.text+"']/source"):
-                    link_src = src.text
-                for tgt in root.findall(".//link[@id='"+link.text+"']/target"):
-                    link_tgt = tgt.text
-                topology[link_src][link_tgt]['link_failure_probability'] = float(link.attrib['probability'])
-    return topology
\ No newline at end of file
+    links, zones = read_zone_table(args.topology_file)
+    node_ids = topology.graph['node_ids']
+    for zone in zones:
+        for region in zone:
+            for link_id, probability in region:
+                link_src, link_tgt = links[link_id]
+                topology[node_ids[link_src]][node_ids[link_tgt]]['link_failure_probability'] = probability
+    return topology
+
+
+# folder of the compiled topology bundles, and version of the bundle format
+TOPOLOGY_BUNDLE_FOLDER = 'config/compiled'
+TOPOLOGY_BUNDLE_VERSION = 2
+
+
+def get_topology_bundle_folder(args):
+    """
+    Returns the folder of the compiled bundle of a topology, named after the topology file and a hash of
+    its content, the number of paths and the DC placement.
+    """
+    digest = hashlib.sha256()
+    with open('config/topologies/' + args.topology_file, 'rb') as file:
+        digest.update(file.read())
+    digest.update(repr((TOPOLOGY_BUNDLE_VERSION, args.k_paths, args.dc_placement, args.num_dcs)).encode())
+    name = os.path.splitext(args.topology_file)[0]
+    return os.path.join(TOPOLOGY_BUNDLE_FOLDER, f'{name}-{digest.hexdigest()[:16]}')
+
+
+def _pack_paths(topology, k_shortest_paths, prefix, arrays):
+    pairs = [(n1, n2) for n1 in topology.graph['source_nodes'] for n2 in topology.graph['dcs']]
+    paths = [path for pair in pairs for path in k_shortest_paths[pair]]
+    arrays[prefix + '_pair_ptr'] = np.cumsum([0] + [len(k_shortest_paths[pair]) for pair in pairs])
+    arrays[prefix + '_node_ptr'] = np.cumsum([0] + [len(path.nodes) for path in paths])
+    arrays[prefix + '_nodes'] = np.concatenate([path.nodes for path in paths] + [np.zeros(0, dtype=np.int64)])
+    arrays[prefix + '_link_ptr'] = np.cumsum([0] + [len(path.links) for path in paths])
+    arrays[prefix + '_links'] = np.concatenate([path.links for path in paths] + [np.zeros(0, dtype=np.int64)])
+    arrays[prefix + '_lengths'] = np.array([path.length for path in paths], dtype=np.float64)
+
+
+def _unpack_paths(topology, prefix, arrays):
+    pair_ptr, node_ptr, nodes = arrays[prefix + '_pair_ptr'], arrays[prefix + '_node_ptr'], arrays[prefix + '_nodes']
+    link_ptr, links, lengths = arrays[prefix + '_link_ptr'], arrays[prefix + '_links'], arrays[prefix + '_lengths']
+    k_shortest_paths = {}
+    pair = 0
+    for n1 in topology.graph['source_nodes']:
+        for n2 in topology.graph['dcs']:
+            objs = []
+            for idx in range(pair_ptr[pair], pair_ptr[pair + 1]):
+                path_nodes = nodes[node_ptr[idx]:node_ptr[idx + 1]]
+                objs.append(Path(path_nodes.tolist(), lengths[idx], path_nodes, links[link_ptr[idx]:link_ptr[idx + 1]]))
+            # both directions have the same paths, i.e., bidirectional symmetrical links
+            k_shortest_paths[n1, n2] = objs
+            k_shortest_paths[n2, n1] = objs
+            pair += 1
+    return k_shortest_paths
+
+
+def compile_topology(args, folder):
+    """
+    Reads the topology, places the DCs and computes the k-shortest paths and disaster zones,
+    and writes everything as a bundle of NumPy arrays (one .npy file per array) in `folder`.
+    The bundle is written to a temporary folder that is then renamed, so concurrent runs can share it.
+    """
+    topology = get_topology(args)
+    topology = get_dcs(args, topology)
+    topology = get_ksp(args, topology)
+    topology = get_probability_ksp(args, topology)
+
+    edges = list(topology.edges(data=True))  # in the order of the link ids
+    arrays = {
+        'node_names': np.array(topology.graph['node_names']),
+        'node_pos': np.array([topology.nodes[node]['pos'] for node in topology.nodes()], dtype=np.float64),
+        'edges': np.array([(n1, n2) for n1, n2, _ in edges], dtype=np.int64).reshape(-1, 2),
+        'edge_index': np.array([data['index'] for _, _, data in edges], dtype=np.int64),
+        'edge_length': np.array([data['length'] for _, _, data in edges], dtype=np.float64),
+        'edge_failure_probability': np.array([data['link_failure_probability'] for _, _, data in edges], dtype=np.float64),
+        'dcs': np.array(topology.graph['dcs'], dtype=np.int64),
+        'source_nodes': np.array(topology.graph['source_nodes'], dtype=np.int64),
+        'topology_name': np.array(topology.graph.get('name', '')),
+        'coordinates_type': np.array(topology.graph.get('coordinatesType', '')),
+    }
+    if any('name' in data for _, data in topology.nodes(data=True)):  # long names of the nodes of .txt topologies
+        arrays['node_labels'] = np.array([topology.nodes[node].get('name', '') for node in topology.nodes()])
+    zones = get_disaster_zones(topology, args.topology_file)
+    arrays['zone_ptr'] = np.cumsum([0] + [len(zone) for zone in zones])
+    arrays['region_ptr'] = np.cumsum([0] + [len(region) for zone in zones for region in zone])
+    links = [link for zone in zones for region in zone for link in region]
+    arrays['zone_links'] = np.array([link[:2] for link in links], dtype=np.int64).reshape(-1, 2)
+    arrays['zone_link_probability'] = np.array([link[2] for link in links], dtype=np.float64)
+    arrays['zone_link_index'] = np.array([link[3] for link in links], dtype=np.int64)
+    _pack_paths(topology, topology.graph['ksp'], 'ksp', arrays)
+    _pack_paths(topology, topology.graph['prob_ksp'], 'prob_ksp', arrays)
+
+    os.makedirs(TOPOLOGY_BUNDLE_FOLDER, exist_ok=True)
+    temp_folder = tempfile.mkdtemp(dir=TOPOLOGY_BUNDLE_FOLDER, prefix='.tmp-')
+    for name, array in arrays.items():
+        np.save(os.path.join(temp_folder, name + '.npy'), array)
+    try:
+        os.rename(temp_folder, folder)
+    except OSError:  # compiled by a concurrent run in the meantime
+        shutil.rmtree(temp_folder)
+
+
+def load_topology_bundle(folder):
+    """
+    Loads a topology compiled by `compile_topology`, with the same attributes as the one returned by
+    `get_topology`, `get_dcs`, `get_ksp` and `get_probability_ksp`.
+    The arrays are memory-mapped, so processes loading the same bundle share its pages.
+    """
+    arrays = {file_name[:-4]: np.load(os.path.join(folder, file_name), mmap_mode='r')
+              for file_name in os.listdir(folder) if file_name.endswith('.npy')}
+    node_names = arrays['node_names'].tolist()
+    topology = nx.Graph(node_names=node_names, node_ids={name: idx for idx, name in enumerate(node_names)})
+    if arrays['topology_name'].item():
+        topology.graph['name'] = arrays['topology_name'].item()
+    if arrays['coordinates_type'].item():
+        topology.graph['coordinatesType'] = arrays['coordinates_type'].item()
+    dcs = set(arrays['dcs'].tolist())
+    for node, pos in enumerate(arrays['node_pos'].tolist()):
+        topology.add_node(node, pos=tuple(pos), failed=False, dc=node in dcs)
+    if 'node_labels' in arrays:
+        for node, label in enumerate(arrays['node_labels'].tolist()):
+            topology.nodes[node]['name'] = label
+    # edges are added in the order they were read from the file, which gives the same adjacency order
+    edges, edge_index = arrays['edges'], arrays['edge_index']
+    for link in np.argsort(edge_index, kind='stable').tolist():
+        topology.add_edge(int(edges[link, 0]), int(edges[link, 1]), id=link, weight=1.0,
+                          length=float(arrays['edge_length'][link]), index=int(edge_index[link]), failed=False,
+                          link_failure_probability=float(arrays['edge_failure_probability'][link]))
+    for idx, (n1, n2) in enumerate(topology.edges()):
+        if topology[n1][n2]['id'] != idx:
+            raise ValueError(f'Edges of the topology bundle `{folder}` are not in the order of their ids')
+    topology.graph['node_indices'] = list(range(len(node_names)))
+    topology.graph['dcs'] = arrays['dcs'].tolist()
+    topology.graph['source_nodes'] = arrays['source_nodes'].tolist()
+
+    set_ksp(topology, _unpack_paths(topology, 'ksp', arrays))
+    topology.graph['prob_ksp'] = _unpack_paths(topology, 'prob_ksp', arrays)
+
+    zone_ptr, region_ptr = arrays['zone_ptr'], arrays['region_ptr']
+    zone_links = arrays['zone_links'].tolist()
+    probabilities = arrays['zone_link_probability'].tolist()
+    link_indices = arrays['zone_link_index'].tolist()
+    topology.graph['disaster_zones'] = tuple(
+        tuple(tuple((zone_links[link][0], zone_links[link][1], probabilities[link], link_indices[link])
+                    for link in range(region_ptr[region], region_ptr[region + 1]))
+              for region in range(zone_ptr[zone], zone_ptr[zone + 1]))
+        for zone in range(len(zone_ptr) - 1))
+    return topology
+
+
+def load_topology(args):
+    """
+    Returns the topology with its DCs, k-shortest paths and disaster zones, loaded from its compiled
+    bundle, which is compiled first if needed.
+    """
+    folder = get_topology_bundle_folder(args)
+    if not os.path.isdir(folder):
+        if tracing.ksp:
+            tracing.emit('ksp', f'Compiling the topology into {folder}')
+        compile_topology(args, folder)
+    return load_topology_bundle(folder)
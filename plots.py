@@ -570,9 +570,10 @@ def plot_topology(env: 'Environment', args):
     # using scatter rather than nx.draw_networkx_nodes to be able to have a legend in the topology
     nodes_x = [pos[x][0] for x in env.topology.graph['source_nodes']]
     nodes_y = [pos[x][1] for x in env.topology.graph['source_nodes']]
+    node_names = env.topology.graph['node_names']
     for idx, node in enumerate(env.topology.graph['source_nodes']):
-        ajust = len(node)/2.5
-        plt.annotate(node, (nodes_x[idx]-ajust, nodes_y[idx]-1), fontsize=5)
+        ajust = len(node_names[node])/2.5
+        plt.annotate(node_names[node], (nodes_x[idx]-ajust, nodes_y[idx]-1), fontsize=5)
     plt.scatter(nodes_x, nodes_y, label='Node', color='blue', alpha=1., marker='o', linewidths=1., edgecolors='black', s=160.)
     nodes_x = [pos[x][0] for x in env.topology.graph['dcs']]
     nodes_y = [pos[x][1] for x in env.topology.graph['dcs']]
@@ -580,8 +581,8 @@ def plot_topology(env: 'Environment', args):
     
     #Writes dc's name under it
     for idx, dc in enumerate(env.topology.graph['dcs']):
-        ajust = len(dc)/2.5
-        plt.annotate(dc, (nodes_x[idx]-ajust, nodes_y[idx]-1.1),  bbox = bbox, fontsize=7)
+        ajust = len(node_names[dc])/2.5
+        plt.annotate(node_names[dc], (nodes_x[idx]-ajust, nodes_y[idx]-1.1),  bbox = bbox, fontsize=7)
 
         
     plt.legend(loc=1)
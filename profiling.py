@@ -0,0 +1,63 @@
+"""
+Optional profiling of the simulations, enabled with `--profile`.
+For each seed, it records the number of calls, total wall time and a latency histogram of each event handler
+(arrival, departure, disaster_arrival, ...), of the route and restore calls made through `Environment.route`
+and `Environment.restore`, and the number of (DC, path) candidates examined by the routing policies.
+"""
+import bisect
+import os
+import pickle
+from typing import Dict, List
+
+import numpy as np
+
+# upper edges of the latency histogram bins, in seconds, from 0.1 us to 10 s in quarter decades;
+# the last bin counts the calls slower than the last edge
+HISTOGRAM_EDGES: List[float] = np.logspace(-7, 1, 33).tolist()
+
+
+class Profile:
+    """
+    Profile of one simulation run.
+    While a replication is profiled, the profile is kept in `Environment.profiler`, where the environment
+    times the sections with `record` and the routing policies add to `route_candidates`.
+    """
+
+    def __init__(self):
+        # section name -> [number of calls, total time in seconds, histogram]
+        self.sections: Dict[str, list] = {}
+        self.route_candidates: int = 0  # candidates examined by the route calls
+
+    def record(self, section: str, elapsed: float) -> None:
+        stats = self.sections.get(section)
+        if stats is None:
+            stats = self.sections[section] = [0, 0.0, [0] * (len(HISTOGRAM_EDGES) + 1)]
+        stats[0] += 1
+        stats[1] += elapsed
+        stats[2][bisect.bisect_left(HISTOGRAM_EDGES, elapsed)] += 1
+
+    def to_dict(self) -> dict:
+        return {
+            'sections': {section: {'count': count, 'total_time': total_time, 'histogram': histogram}
+                         for section, (count, total_time, histogram) in self.sections.items()},
+            'route_candidates': self.route_candidates,
+            'histogram_edges': HISTOGRAM_EDGES,
+        }
+
+
+def write_profiles(output_folder: str, profiles: Dict[tuple, dict]) -> None:
+    """
+    Writes the profiles of all the runs, keyed by (routing policy, restoration policy, load, seed),
+    to `profile.h5` (pickled, like `final_results.h5`) and as a table to `profile.txt`.
+    """
+    folder = os.path.join('results', output_folder)
+    with open(os.path.join(folder, 'profile.h5'), 'wb') as file:
+        pickle.dump(profiles, file)
+    with open(os.path.join(folder, 'profile.txt'), 'wt') as file:
+        file.write('routing_policy\trestoration_policy\tload\tseed\tsection\tcount\ttotal_time\tmean_time\n')
+        for (routing_policy, restoration_policy, load, seed), profile in sorted(profiles.items()):
+            key = f'{routing_policy}\t{restoration_policy}\t{load}\t{seed}'
+            for section, stats in sorted(profile['sections'].items()):
+                file.write(f'{key}\t{section}\t{stats["count"]}\t{stats["total_time"]:.6f}\t'
+                           f'{stats["total_time"] / stats["count"]:.9f}\n')
+            file.write(f'{key}\troute_candidates\t{profile["route_candidates"]}\t\t\n')
@@ -0,0 +1,82 @@
+import glob
+import os
+from typing import Dict, List
+
+# fields of each record of the log, one line per failure event
+FIELDS = ('time', 'routing_policy', 'restoration_policy', 'load', 'seed',
+          'disrupted', 'restored', 'relocated', 'lost', 'aecl')
+
+
+class RestorationLog:
+    """
+    Buffered log of the restoration of the services disrupted by each failure event.
+    Each process writes its records to its own file in the output folder, in blocks of `buffer_size` records,
+    so that the processes of a pool never write to the same file.
+    The files of all the processes are merged by `merge_restoration_logs` once the simulations are over.
+    """
+
+    def __init__(self, folder: str, buffer_size: int = 4096):
+        self.file: str = os.path.join(folder, f'services_restoration-{os.getpid()}.tsv')
+        self.buffer_size: int = buffer_size
+        self._buffer: List[str] = []
+
+    def write(self, *record) -> None:
+        """
+        Adds a record with the values of `FIELDS`, in that order.
+        """
+        self._buffer.append('\t'.join(str(value) for value in record))
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if len(self._buffer) > 0:
+            with open(self.file, 'a') as file:
+                file.write('\n'.join(self._buffer) + '\n')
+            self._buffer.clear()
+
+
+# logs of the current process, by output folder
+_logs: Dict[str, RestorationLog] = {}
+
+
+def get_restoration_log(output_folder: str) -> RestorationLog:
+    """
+    Returns the log of the current process for the output folder inside results.
+    """
+    if output_folder not in _logs:
+        _logs[output_folder] = RestorationLog(os.path.join('results', output_folder))
+    return _logs[output_folder]
+
+
+def flush_restoration_logs() -> None:
+    """
+    Writes the buffered records of all the logs of the current process, e.g., at the end of each seed.
+    """
+    for log in _logs.values():
+        log.flush()
+
+
+def merge_restoration_logs(output_folder: str) -> None:
+    """
+    Merges the logs written by all the processes into `services_restoration.txt`, with one header line
+    and the records sorted by policies, load, seed and time, and removes the files of the processes.
+    The records already in `services_restoration.txt` are kept, so it can be called after each configuration.
+    """
+    folder = os.path.join('results', output_folder)
+    files = sorted(glob.glob(os.path.join(folder, 'services_restoration-*.tsv')))
+    merged_file = os.path.join(folder, 'services_restoration.txt')
+    records = []
+    if os.path.exists(merged_file):
+        with open(merged_file) as file:
+            next(file, None)  # header
+            records.extend(line.rstrip('\n').split('\t') for line in file if line.strip())
+    for file_name in files:
+        with open(file_name) as file:
+            records.extend(line.rstrip('\n').split('\t') for line in file if line.strip())
+    records.sort(key=lambda record: (record[1], record[2], float(record[3]), int(record[4]), float(record[0])))
+    with open(merged_file, 'wt') as file:
+        file.write('\t'.join(FIELDS) + '\n')
+        for record in records:
+            file.write('\t'.join(record) + '\n')
+    for file_name in files:
+        os.remove(file_name)
@@ -10,6 +10,7 @@ from typing import Tuple
 from networkx import Graph
 
 import routing_policies
+import tracing
 
 def services_sorting(self, services: Sequence['Service']):
     sorted_services = []
@@ -30,7 +31,8 @@ def services_sorting(self, services: Sequence['Service']):
             services_list.append(s)
 
     services = services_list
-    print("Length after", len(services))
+    if tracing.restoration:
+        tracing.emit('restoration', f'{len(services)} services sorted by priority')
     return services
 
 class RestorationPolicy(abc.ABC):
@@ -52,6 +54,7 @@ class RestorationPolicy(abc.ABC):
         """
         service.service_time = self.env.current_time - service.arrival_time
         service.availability = service.service_time / service.holding_time
+        self.env.add_service_time(service)
 
 class DoNotRestorePolicy(RestorationPolicy):
     def __init__(self) -> None:
@@ -82,17 +85,19 @@ class PathRestorationPolicy(RestorationPolicy):
         """
         
         # tries to get a path
-        path: Optional['Path'] = routing_policies.get_shortest_path(self.env.topology, service)
+        path: Optional['Path'] = routing_policies.get_shortest_path(self.env, service)
 
         # if a path was found, sets it and returns true
         if path is not None:
             service.route = path
-            print ("Encontrou caminho")
+            if tracing.restoration:
+                tracing.emit('restoration', f'Path found for {service}')
             return True
         # if not, sets None and returns False
         else:
             service.route = None
-            print("Nao encontrou caminho")
+            if tracing.restoration:
+                tracing.emit('restoration', f'No path found for {service}')
             return False
 
     def restore(self, services: Sequence['Service']):
@@ -107,10 +112,8 @@ class PathRestorationPolicy(RestorationPolicy):
         
         services = services_sorting(self, services)
 
-        print("Lista de prioridades")
-        for s in services:
-            print(s.priority_class.priority)
-        print("Lista de prioridades")
+        if tracing.restoration:
+            tracing.emit('restoration', f'Priorities: {[s.priority_class.priority for s in services]}')
         '''
         for s in services:
             if s.priority_class.priority == 1:
@@ -137,7 +140,7 @@ class PathRestorationPolicy(RestorationPolicy):
                 service.failed = False
                 restored_services += 1
                 self.env.provision_service(service)
-                service.expected_risk = routing_policies.get_path_risk(self.env.topology, service.route)
+                service.expected_risk = routing_policies.get_path_risk(self.env.state, service.route)
             else:  # no alternative was found
                 self.drop_service(service)
         return services
@@ -159,14 +162,16 @@ class PathRestorationWithRelocationPolicy(PathRestorationPolicy):
         Returns:
             _type_: _description_
         """
-        success, dc, path = self.env.routing_policy.route(service)
+        success, dc, path = self.env.route(service)
         if success:
             service.route = path
-            print("Realocou")
+            if tracing.restoration:
+                tracing.emit('restoration', f'Relocated {service} to DC {dc}')
             return True
         else:
             service.route = None
-            print("Nao realocou")
+            if tracing.restoration:
+                tracing.emit('restoration', f'No DC found to relocate {service}')
             return False
 
     def restore(self, services: Sequence['Service']):
@@ -216,28 +221,29 @@ class PathRestorationWithRelocationPolicy(PathRestorationPolicy):
             return services
         '''
         for service in services:
-            print('trying', service)
+            if tracing.restoration:
+                tracing.emit('restoration', f'Trying {service}')
             if(service.holding_time - (self.env.current_time - service.arrival_time))>1800.0:
                 if self.restore_path(service):
                     service.failed = False
                     restored_services += 1
                     self.env.provision_service(service)
-                    service.expected_risk = routing_policies.get_path_risk(self.env.topology, service.route)
+                    service.expected_risk = routing_policies.get_path_risk(self.env.state, service.route)
                 elif self.relocate_restore_path(service):
                     service.failed = False
                     service.relocated = True
                     restored_services += 1
                     relocated_services += 1
                     self.env.provision_service(service)
-                    service.expected_risk = routing_policies.get_path_risk(self.env.topology, service.route)
+                    service.expected_risk = routing_policies.get_path_risk(self.env.state, service.route)
                 else:  # no alternative was found
                     self.drop_service(service)
             else:  # no alternative was found
                 self.drop_service(service)
                 failed_services+=1
             
-        print("perdidos: ")
-        print(failed_services)
+        if tracing.restoration:
+            tracing.emit('restoration', f'{failed_services} services lost')
         return services
 
 
@@ -261,19 +267,21 @@ class PathRestorationPropabilitiesAware(RestorationPolicy):
         #print("chama safest")
         # tries to get a path
         #print("entrada>>get_safest_path")
-        path: Optional['Path'] = routing_policies.get_safest_path(self.env.topology, service) 
+        path: Optional['Path'] = routing_policies.get_safest_path(self.env, service) 
         #print("get_safest_path>>saida")
-        #path: Optional['Path'] = routing_policies.get_shortest_path(self.env.topology, service)#(juliana alteracao)
+        #path: Optional['Path'] = routing_policies.get_shortest_path(self.env, service)#(juliana alteracao)
         #print("returned by safest: ")
         # if a path was found, sets it and returns true
         if path is not None:
             service.route = path
-            print ("Encontrou caminho")
+            if tracing.restoration:
+                tracing.emit('restoration', f'Path found for {service}')
             return True
         # if not, sets None and returns False
         else:
             service.route = None
-            print("Nao encontrou caminho")
+            if tracing.restoration:
+                tracing.emit('restoration', f'No path found for {service}')
             return False
     def relocate_restore_path(self, service:'Service') -> bool:
         """
@@ -286,14 +294,16 @@ class PathRestorationPropabilitiesAware(RestorationPolicy):
         Returns:
             _type_: _description_
         """
-        success, dc, path = routing_policies.get_safest_dc(self.env.topology, service)#duvida: onde?
+        success, dc, path = routing_policies.get_safest_dc(self.env, service)#duvida: onde?
         if success:
             service.route = path
-            print("Realocou")
+            if tracing.restoration:
+                tracing.emit('restoration', f'Relocated {service} to DC {dc}')
             return True
         else:
             service.route = None
-            print("Nao realocou")
+            if tracing.restoration:
+                tracing.emit('restoration', f'No DC found to relocate {service}')
             return False
     def restore(self, services: Sequence['Service']):
         # TODO: implement the method
@@ -340,14 +350,14 @@ class PathRestorationPropabilitiesAware(RestorationPolicy):
                     service.failed = False
                     restored_services += 1
                     self.env.provision_service(service)
-                    service.expected_risk = routing_policies.get_path_risk(self.env.topology, service.route)
+                    service.expected_risk = routing_policies.get_path_risk(self.env.state, service.route)
                 elif self.relocate_restore_path(service):
                     service.failed = False
                     service.relocated = True
                     restored_services += 1
                     relocated_services += 1
                     self.env.provision_service(service)
-                    service.expected_risk = routing_policies.get_path_risk(self.env.topology, service.route)
+                    service.expected_risk = routing_policies.get_path_risk(self.env.state, service.route)
                 else:  # no alternative was found
                     self.drop_service(service)
             else:  # no alternative was found
@@ -374,19 +384,21 @@ class PathRestorationBalancedPropabilitiesAware(RestorationPolicy):
         #print("chama safest")
         # tries to get a path
         #print("entrada>>get_safest_path")
-        path: Optional['Path'] = routing_policies.get_balanced_sasfest_path(self.env.topology, service) 
+        path: Optional['Path'] = routing_policies.get_balanced_sasfest_path(self.env, service) 
         #print("get_safest_path>>saida")
-        #path: Optional['Path'] = routing_policies.get_shortest_path(self.env.topology, service)#(juliana alteracao)
+        #path: Optional['Path'] = routing_policies.get_shortest_path(self.env, service)#(juliana alteracao)
         #print("returned by safest: ")
         # if a path was found, sets it and returns true
         if path is not None:
             service.route = path
-            print ("Encontrou caminho")
+            if tracing.restoration:
+                tracing.emit('restoration', f'Path found for {service}')
             return True
         # if not, sets None and returns False
         else:
             service.route = None
-            print("Nao encontrou caminho")
+            if tracing.restoration:
+                tracing.emit('restoration', f'No path found for {service}')
             return False
     def relocate_restore_path(self, service:'Service') -> bool:
         """
@@ -399,14 +411,16 @@ class PathRestorationBalancedPropabilitiesAware(RestorationPolicy):
         Returns:
             _type_: _description_
         """
-        success, dc, path = routing_policies.get_balanced_safest_dc(self.env.topology, service)#duvida: onde?
+        success, dc, path = routing_policies.get_balanced_safest_dc(self.env, service)#duvida: onde?
         if success:
             service.route = path
-            print("Realocou")
+            if tracing.restoration:
+                tracing.emit('restoration', f'Relocated {service} to DC {dc}')
             return True
         else:
             service.route = None
-            print("Nao realocou")
+            if tracing.restoration:
+                tracing.emit('restoration', f'No DC found to relocate {service}')
             return False
     def restore(self, services: Sequence['Service']):
         # TODO: implement the method
@@ -423,14 +437,14 @@ class PathRestorationBalancedPropabilitiesAware(RestorationPolicy):
                     service.failed = False
                     restored_services += 1
                     self.env.provision_service(service)
-                    service.expected_risk = routing_policies.get_path_risk(self.env.topology, service.route)
+                    service.expected_risk = routing_policies.get_path_risk(self.env.state, service.route)
                 elif self.relocate_restore_path(service):
                     service.failed = False
                     service.relocated = True
                     restored_services += 1
                     relocated_services += 1
                     self.env.provision_service(service)
-                    service.expected_risk = routing_policies.get_path_risk(self.env.topology, service.route)
+                    service.expected_risk = routing_policies.get_path_risk(self.env.state, service.route)
                 else:  # no alternative was found
                     self.drop_service(service)
             else:  # no alternative was found
@@ -457,19 +471,21 @@ class PathRestorationBalancedPropabilitiesAware04(RestorationPolicy):
         #print("chama safest")
         # tries to get a path
         #print("entrada>>get_safest_path")
-        path: Optional['Path'] = routing_policies.get_path_alfa_04(self.env.topology, service) 
+        path: Optional['Path'] = routing_policies.get_path_alfa_04(self.env, service) 
         #print("get_safest_path>>saida")
-        #path: Optional['Path'] = routing_policies.get_shortest_path(self.env.topology, service)#(juliana alteracao)
+        #path: Optional['Path'] = routing_policies.get_shortest_path(self.env, service)#(juliana alteracao)
         #print("returned by safest: ")
         # if a path was found, sets it and returns true
         if path is not None:
             service.route = path
-            print ("Encontrou caminho")
+            if tracing.restoration:
+                tracing.emit('restoration', f'Path found for {service}')
             return True
         # if not, sets None and returns False
         else:
             service.route = None
-            print("Nao encontrou caminho")
+            if tracing.restoration:
+                tracing.emit('restoration', f'No path found for {service}')
             return False
     def relocate_restore_path(self, service:'Service') -> bool:
         """
@@ -482,14 +498,16 @@ class PathRestorationBalancedPropabilitiesAware04(RestorationPolicy):
         Returns:
             _type_: _description_
         """
-        success, dc, path = routing_policies.get_dc_alfa_04(self.env.topology, service)#duvida: onde?
+        success, dc, path = routing_policies.get_dc_alfa_04(self.env, service)#duvida: onde?
         if success:
             service.route = path
-            print("Realocou")
+            if tracing.restoration:
+                tracing.emit('restoration', f'Relocated {service} to DC {dc}')
             return True
         else:
             service.route = None
-            print("Nao realocou")
+            if tracing.restoration:
+                tracing.emit('restoration', f'No DC found to relocate {service}')
             return False
     def restore(self, services: Sequence['Service']):
         # TODO: implement the method
@@ -506,14 +524,14 @@ class PathRestorationBalancedPropabilitiesAware04(RestorationPolicy):
                     service.failed = False
                     restored_services += 1
                     self.env.provision_service(service)
-                    service.expected_risk = routing_policies.get_path_risk(self.env.topology, service.route)
+                    service.expected_risk = routing_policies.get_path_risk(self.env.state, service.route)
                 elif self.relocate_restore_path(service):
                     service.failed = False
                     service.relocated = True
                     restored_services += 1
                     relocated_services += 1
                     self.env.provision_service(service)
-                    service.expected_risk = routing_policies.get_path_risk(self.env.topology, service.route)
+                    service.expected_risk = routing_policies.get_path_risk(self.env.state, service.route)
                 else:  # no alternative was found
                     self.drop_service(service)
             else:  # no alternative was found
@@ -540,19 +558,21 @@ class PathRestorationBalancedPropabilitiesAware03(RestorationPolicy):
         #print("chama safest")
         # tries to get a path
         #print("entrada>>get_safest_path")
-        path: Optional['Path'] = routing_policies.get_path_alfa_03(self.env.topology, service) 
+        path: Optional['Path'] = routing_policies.get_path_alfa_03(self.env, service) 
         #print("get_safest_path>>saida")
-        #path: Optional['Path'] = routing_policies.get_shortest_path(self.env.topology, service)#(juliana alteracao)
+        #path: Optional['Path'] = routing_policies.get_shortest_path(self.env, service)#(juliana alteracao)
         #print("returned by safest: ")
         # if a path was found, sets it and returns true
         if path is not None:
             service.route = path
-            print ("Encontrou caminho")
+            if tracing.restoration:
+                tracing.emit('restoration', f'Path found for {service}')
             return True
         # if not, sets None and returns False
         else:
             service.route = None
-            print("Nao encontrou caminho")
+            if tracing.restoration:
+                tracing.emit('restoration', f'No path found for {service}')
             return False
     def relocate_restore_path(self, service:'Service') -> bool:
         """
@@ -565,14 +585,16 @@ class PathRestorationBalancedPropabilitiesAware03(RestorationPolicy):
         Returns:
             _type_: _description_
         """
-        success, dc, path = routing_policies.get_dc_alfa_03(self.env.topology, service)#duvida: onde?
+        success, dc, path = routing_policies.get_dc_alfa_03(self.env, service)#duvida: onde?
         if success:
             service.route = path
-            print("Realocou")
+            if tracing.restoration:
+                tracing.emit('restoration', f'Relocated {service} to DC {dc}')
             return True
         else:
             service.route = None
-            print("Nao realocou")
+            if tracing.restoration:
+                tracing.emit('restoration', f'No DC found to relocate {service}')
             return False
     def restore(self, services: Sequence['Service']):
         # TODO: implement the method
@@ -589,14 +611,14 @@ class PathRestorationBalancedPropabilitiesAware03(RestorationPolicy):
                     service.failed = False
                     restored_services += 1
                     self.env.provision_service(service)
-                    service.expected_risk = routing_policies.get_path_risk(self.env.topology, service.route)
+                    service.expected_risk = routing_policies.get_path_risk(self.env.state, service.route)
                 elif self.relocate_restore_path(service):
                     service.failed = False
                     service.relocated = True
                     restored_services += 1
                     relocated_services += 1
                     self.env.provision_service(service)
-                    service.expected_risk = routing_policies.get_path_risk(self.env.topology, service.route)
+                    service.expected_risk = routing_policies.get_path_risk(self.env.state, service.route)
                 else:  # no alternative was found
                     self.drop_service(service)
             else:  # no alternative was found
@@ -623,19 +645,21 @@ class PathRestorationBalancedPropabilitiesAware01(RestorationPolicy):
         #print("chama safest")
         # tries to get a path
         #print("entrada>>get_safest_path")
-        path: Optional['Path'] = routing_policies.get_path_alfa_01(self.env.topology, service) 
+        path: Optional['Path'] = routing_policies.get_path_alfa_01(self.env, service) 
         #print("get_safest_path>>saida")
-        #path: Optional['Path'] = routing_policies.get_shortest_path(self.env.topology, service)#(juliana alteracao)
+        #path: Optional['Path'] = routing_policies.get_shortest_path(self.env, service)#(juliana alteracao)
         #print("returned by safest: ")
         # if a path was found, sets it and returns true
         if path is not None:
             service.route = path
-            print ("Encontrou caminho")
+            if tracing.restoration:
+                tracing.emit('restoration', f'Path found for {service}')
             return True
         # if not, sets None and returns False
         else:
             service.route = None
-            print("Nao encontrou caminho")
+            if tracing.restoration:
+                tracing.emit('restoration', f'No path found for {service}')
             return False
     def relocate_restore_path(self, service:'Service') -> bool:
         """
@@ -648,14 +672,16 @@ class PathRestorationBalancedPropabilitiesAware01(RestorationPolicy):
         Returns:
             _type_: _description_
         """
-        success, dc, path = routing_policies.get_dc_alfa_01(self.env.topology, service)#duvida: onde?
+        success, dc, path = routing_policies.get_dc_alfa_01(self.env, service)#duvida: onde?
         if success:
             service.route = path
-            print("Realocou")
+            if tracing.restoration:
+                tracing.emit('restoration', f'Relocated {service} to DC {dc}')
             return True
         else:
             service.route = None
-            print("Nao realocou")
+            if tracing.restoration:
+                tracing.emit('restoration', f'No DC found to relocate {service}')
             return False
     def restore(self, services: Sequence['Service']):
         # TODO: implement the method
@@ -672,14 +698,14 @@ class PathRestorationBalancedPropabilitiesAware01(RestorationPolicy):
                     service.failed = False
                     restored_services += 1
                     self.env.provision_service(service)
-                    service.expected_risk = routing_policies.get_path_risk(self.env.topology, service.route)
+                    service.expected_risk = routing_policies.get_path_risk(self.env.state, service.route)
                 elif self.relocate_restore_path(service):
                     service.failed = False
                     service.relocated = True
                     restored_services += 1
                     relocated_services += 1
                     self.env.provision_service(service)
-                    service.expected_risk = routing_policies.get_path_risk(self.env.topology, service.route)
+                    service.expected_risk = routing_policies.get_path_risk(self.env.state, service.route)
                 else:  # no alternative was found
                     self.drop_service(service)
             else:  # no alternative was found
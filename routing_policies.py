@@ -3,10 +3,11 @@ import typing
 import numpy as np
 from typing import Tuple, Optional
 import random
+import tracing
 if typing.TYPE_CHECKING:
-    from core import Service
-    from graph import Path
-    from networkx import Graph
+    from core import Environment, Service
+    from graph import CandidateTable, Path
+    from state import NetworkState
 
 
 class RoutingPolicy(abc.ABC):
@@ -29,20 +30,19 @@ class ClosestAvailableDC(RoutingPolicy):
         """
         Finds the closest DC with enough available CPUs and with a path with enough available network resources
         """
-        found = False
-        closest_path_hops = np.finfo(0.0).max  # initializes load to the maximum value of a float
-        closest_dc = None
-        closest_path = None
-        for iddc, dc in enumerate(self.env.topology.graph['dcs']):
-            if self.env.topology.nodes[dc]['available_units'] >= service.computing_units:
-                paths = self.env.topology.graph['ksp'][service.source, dc] #Pegar o service.dest ao inves do source
-                for idp, path in enumerate(paths):
-                    if is_path_viable(self.env.topology, path, service.network_units) and closest_path_hops > path.hops:
-                        closest_path_hops = path.hops
-                        closest_dc = dc
-                        closest_path = path
-                        found = True
-        return found, closest_dc, closest_path  # returns false and an index out of bounds if no path is available
+        state = self.env.state
+        candidates = self.env.topology.graph['candidates'][service.source].by_hops
+        # candidates are sorted by hops, so the first viable one is the closest
+        for idx, (dc, dc_index, path) in enumerate(candidates):
+            if state.node_available_units[dc_index] >= service.computing_units \
+                    and is_path_viable(state, path, service.network_units):
+                if self.env.profiler is not None:
+                    self.env.profiler.route_candidates += idx + 1
+                return True, dc, path
+        if self.env.profiler is not None:
+            self.env.profiler.route_candidates += len(candidates)
+        return False, None, None
+
 class RandomAvailableDC(RoutingPolicy):
 
     def __init__(self):
@@ -63,10 +63,12 @@ class RandomAvailableDC(RoutingPolicy):
             for d in dc_list:
                 if d == dc:
                     dc_list.remove(d)
-            if self.env.topology.nodes[dc]['available_units'] >= service.computing_units:
+            if self.env.state.node_available_units[dc] >= service.computing_units:
                 paths = self.env.topology.graph['ksp'][service.source, dc]
+                if self.env.profiler is not None:
+                    self.env.profiler.route_candidates += len(paths)
                 for idp, path in enumerate(paths):
-                    if is_path_viable(self.env.topology, path, service.network_units) and closest_path_hops > path.hops:
+                    if is_path_viable(self.env.state, path, service.network_units) and closest_path_hops > path.hops:
                         closest_path_hops = path.hops
                         closest_dc = dc
                         closest_path = path
@@ -89,10 +91,12 @@ class FarthestAvailableDC(RoutingPolicy):
         farthest_dc = None
         farthest_path = None
         for iddc, dc in enumerate(self.env.topology.graph['dcs']):
-            if self.env.topology.nodes[dc]['available_units'] >= service.computing_units:
+            if self.env.state.node_available_units[dc] >= service.computing_units:
                 paths = self.env.topology.graph['ksp'][service.source, dc]
+                if self.env.profiler is not None:
+                    self.env.profiler.route_candidates += len(paths)
                 for idp, path in enumerate(paths):
-                    if is_path_viable(self.env.topology, path, service.network_units) and farthest_path_hops < path.hops:
+                    if is_path_viable(self.env.state, path, service.network_units) and farthest_path_hops < path.hops:
                         farthest_path_hops = path.hops
                         farthest_dc = dc
                         farthest_path = path
@@ -110,70 +114,83 @@ class FullLoadBalancing(RoutingPolicy):
         """
         Finds the path+DC pair with lowest combined load
         """
-        found = False
-        lowest_load = np.finfo(0.0).max  # initializes load to the maximum value of a float
-        closest_dc = None
-        closest_path = None
-        for iddc, dc in enumerate(self.env.topology.graph['dcs']):
-            if self.env.topology.nodes[dc]['available_units'] >= service.computing_units:
-                paths = self.env.topology.graph['ksp'][service.source, dc]
-                for idp, path in enumerate(paths):
-                    load = (get_max_usage(self.env.topology, path) / self.env.resource_units_per_link) * \
-                           ((self.env.topology.nodes[dc]['total_units'] - self.env.topology.nodes[dc]['available_units']) /
-                            self.env.topology.nodes[dc]['total_units'])
-                    if is_path_viable(self.env.topology, path, service.network_units) and load < lowest_load:
-                        lowest_load = load
-                        closest_dc = dc
-                        closest_path = path
-                        found = True
-        return found, closest_dc, closest_path  # returns false and an index out of bounds if no path is available
+        state = self.env.state
+        candidates = self.env.topology.graph['candidates'][service.source]
+        if self.env.profiler is not None:
+            self.env.profiler.route_candidates += len(candidates)
+        viable = get_viable_candidates(state, candidates, service)
+        if not viable.any():
+            return False, None, None
+        dc_usage = (state.node_total_units[candidates.dc_indices] - state.node_available_units[candidates.dc_indices]) / \
+            state.node_total_units[candidates.dc_indices]
+        load = (get_max_usage_candidates(state, candidates) / self.env.resource_units_per_link) * dc_usage
+        # argmin returns the first candidate among the ones with the lowest load
+        best = np.argmin(np.where(viable, load, np.inf))
+        return True, candidates.dcs[best], candidates.paths[best]
+
+
+def is_path_viable(state: 'NetworkState', path: 'Path', number_network_units: int) -> bool:
+    if path.id is not None:  # bottleneck and failures are tracked by the network state
+        return state.path_bottleneck[path.id] >= number_network_units and not state.path_failed[path.id]
+    # ufunc reductions are used directly since the ndarray methods add a noticeable overhead for short paths
+    return np.minimum.reduce(state.link_available_units[path.links]) >= number_network_units \
+        and not np.logical_or.reduce(state.link_failed[path.links]) \
+        and not np.logical_or.reduce(state.node_failed[path.nodes])
+
+
+def get_viable_candidates(state: 'NetworkState', candidates: 'CandidateTable', service: 'Service') -> np.ndarray:
+    """
+    Evaluates all the (DC, path) candidates of a source at once.
+    Returns a boolean array telling which candidates have a DC with enough computing units
+    and a working path with enough network units.
+    """
+    if len(candidates) == 0:
+        return np.zeros(0, dtype=bool)
+    return (state.node_available_units[candidates.dc_indices] >= service.computing_units) \
+        & (state.path_bottleneck[candidates.path_ids] >= service.network_units) \
+        & ~state.path_failed[candidates.path_ids]
 
 
-def is_path_viable(topology: 'Graph', path: 'Path', number_network_units: int) -> bool:
-    for node in path.node_list:
-        if topology.nodes[node]['failed']:
-            return False
-    for i in range(len(path.node_list) - 1):
-        if topology[path.node_list[i]][path.node_list[i + 1]]['failed'] \
-            or topology[path.node_list[i]][path.node_list[i + 1]]['available_units'] < number_network_units:
-            return False
-    return True
+def get_max_usage_candidates(state: 'NetworkState', candidates: 'CandidateTable') -> np.ndarray:
+    """
+    Obtains the maximum usage of resources among the links of each candidate path
+    """
+    return (state.link_total_units[candidates.links] - state.link_available_units[candidates.links]).max(axis=1)
 
 
-def get_max_usage(topology: 'Graph', path: 'Path') -> int:
+def get_max_usage(state: 'NetworkState', path: 'Path') -> int:
     """
     Obtains the maximum usage of resources among all the links forming the path
     """
-    max_usage = np.finfo(0.0).min
-    for i in range(len(path.node_list) - 1):
-        max_usage = max(max_usage, topology[path.node_list[i]][path.node_list[i + 1]]['total_units'] - topology[path.node_list[i]][path.node_list[i + 1]]['available_units'])
-    return max_usage
-
-def get_path_risk(topology: 'Graph', path: 'Path'):
-    aecl:float = 0.0
-    for i in range(len(path.node_list) - 1):
-        x = topology[path.node_list[i]][path.node_list[i + 1]]['current_failure_probability']
-        y = topology[path.node_list[i]][path.node_list[i+1]]['total_units']
-        aecl += topology[path.node_list[i]][path.node_list[i + 1]]['current_failure_probability'] * topology[path.node_list[i]][path.node_list[i+1]]['total_units']
-        #aecl += topology[path.node_list[i]][path.node_list[i+1]]['total_units']
-        #print(topology[path.node_list[i]][path.node_list[i + 1]]['link_failure_probability'])
-        #print(topology[path.node_list[i]][path.node_list[i + 1]]['total_units'])
-    return (aecl / (len(path.node_list) - 1))
-
-def get_shortest_path(topology: 'Graph', service: 'Service') -> Optional['Path']:
+    return np.maximum.reduce(state.link_total_units[path.links] - state.link_available_units[path.links])
+
+def get_path_risk(state: 'NetworkState', path: 'Path'):
+    aecl: float = np.sum(state.link_current_failure_probability[path.links] * state.link_total_units[path.links])
+    return (aecl / path.hops)
+
+def get_risk_profile(state: 'NetworkState', path: 'Path', prob_list) -> list:
+    """
+    Counts how many links of the path currently have each of the failure probabilities in prob_list
+    """
+    probs = state.link_current_failure_probability[path.links]
+    return [int(np.count_nonzero(probs == prob)) for prob in prob_list]
+
+def get_shortest_path(env: 'Environment', service: 'Service') -> Optional['Path']:
+    topology, state = env.topology, env.state
     if service.destination is None:
         raise ValueError(f"Service should have value for destination, got {service}")
     closest_path = None
     closest_path_hops = np.finfo(0.0).max
-    if topology.nodes[service.destination]['available_units'] >= service.computing_units:
+    if state.node_available_units[service.destination] >= service.computing_units:
         paths = topology.graph['ksp'][service.source, service.destination]
         for path in paths:
-            if is_path_viable(topology, path, service.network_units) and closest_path_hops > path.hops:
+            if is_path_viable(state, path, service.network_units) and closest_path_hops > path.hops:
                 closest_path_hops = path.hops
                 closest_path = path
     return closest_path
 
-def get_safest_path(topology: 'Graph', service: 'Service') -> Optional['Path']:
+def get_safest_path(env: 'Environment', service: 'Service') -> Optional['Path']:
+    topology, state = env.topology, env.state
     if service.destination is None:
         raise ValueError(f"Service should have value for destination, got {service}")
     closest_path_hops = np.finfo(0.0).max
@@ -183,29 +200,27 @@ def get_safest_path(topology: 'Graph', service: 'Service') -> Optional['Path']:
     prob_list = [0.73, 0.15, 0.05, 0]
     aux_list = [0,0,0,0]
     aux_dict = []
-    if topology.nodes[service.destination]['available_units'] >= service.computing_units:
+    if state.node_available_units[service.destination] >= service.computing_units:
         #paths = topology.graph['prob_ksp'][service.source, service.destination]
         paths = topology.graph['ksp'][service.source, service.destination]
-        print(len(paths))
+        if tracing.routing:
+            tracing.emit('routing', f'{len(paths)} paths from {service.source} to DC {service.destination}')
         
         for p in paths:
-            if(is_path_viable(topology, p, service.network_units)):
+            if(is_path_viable(state, p, service.network_units)):
                 viable_paths.append(p)
         
         for i, path in enumerate(viable_paths):
-            print("\n")
             aux_list = [0,0,0,0,0]
             aux_list[4] = i
-            for j in range(len(path.node_list)-1):
-                for idx, prob in enumerate(prob_list):
-                    if float(topology[path.node_list[j]][path.node_list[j+1]]['current_failure_probability']) == prob:
-                        aux_list[idx]+=1
+            aux_list[:4] = get_risk_profile(state, path, prob_list)
                 
             aux_dict.append(aux_list)
         aux_dict.sort()
 
         if len(aux_dict) >0:
-            print(aux_dict)
+            if tracing.routing:
+                tracing.emit('routing', f'Risk profiles of the viable paths: {aux_dict}')
             safest_path_aux_list = aux_dict[0]
             safest_path = viable_paths[safest_path_aux_list[4]]
         else:
@@ -215,9 +230,9 @@ def get_safest_path(topology: 'Graph', service: 'Service') -> Optional['Path']:
         for path in paths:
             print("get safest path hops")
             
-            new_path_risk = get_path_risk(topology, path)
+            new_path_risk = get_path_risk(state, path)
             print("Anterior: ", new_path_risk)
-            if is_path_viable(topology, path, service.network_units) and safest_path_risk > new_path_risk:
+            if is_path_viable(state, path, service.network_units) and safest_path_risk > new_path_risk:
                 print (new_path_risk)
                 closest_path_hops = path.hops
                 safest_path_risk = new_path_risk
@@ -226,10 +241,11 @@ def get_safest_path(topology: 'Graph', service: 'Service') -> Optional['Path']:
     #print(safest_path_risk)
     return safest_path
 
-def get_safest_dc(topology: 'Graph', service: 'Service') -> Tuple[bool, str, 'Path']:
+def get_safest_dc(env: 'Environment', service: 'Service') -> Tuple[bool, str, 'Path']:
         """
         Finds the path+DC pair with lowest combined load
         """
+        topology, state = env.topology, env.state
         prob_list = [0.73, 0.15, 0.05, 0]
         aux_list = [0,0,0,0]
         aux_dict = []
@@ -238,29 +254,25 @@ def get_safest_dc(topology: 'Graph', service: 'Service') -> Tuple[bool, str, 'Pa
         safest_path = None
         safest_dc = None
         for iddc, dc in enumerate(topology.graph['dcs']):
-            if topology.nodes[dc]['available_units'] >= service.computing_units:
+            if state.node_available_units[dc] >= service.computing_units:
                 paths = topology.graph['ksp'][service.source, dc]
                 for idp, path in enumerate(paths):
-                    aux_list = [0,0,0,0]
-                    for j in range(len(path.node_list)-1):
-                        for idx, prob in enumerate(prob_list):
-                            if float(topology[path.node_list[j]][path.node_list[j+1]]['current_failure_probability']) == prob:
-                                aux_list[idx]+=1
+                    aux_list = get_risk_profile(state, path, prob_list)
                     risk = aux_list.copy()
-                    if is_path_viable(topology, path, service.network_units) and risk < lowest_risk:
+                    if is_path_viable(state, path, service.network_units) and risk < lowest_risk:
                         lowest_risk=risk.copy()
                         safest_dc = dc
                         safest_path = path
                         found = True
-                        print("Lowest risk::", lowest_risk)
-                        print("Safest DC::", safest_dc)
-                        print(".")
+                        if tracing.routing:
+                            tracing.emit('routing', f'Lowest risk: {lowest_risk}\tSafest DC: {safest_dc}')
         return found, safest_dc, safest_path  # returns false and an index out of bounds if no path is available
 
-def get_balanced_safest_dc(topology: 'Graph', service: 'Service') -> Tuple[bool, str, 'Path']:
+def get_balanced_safest_dc(env: 'Environment', service: 'Service') -> Tuple[bool, str, 'Path']:
         """
         Finds the path+DC pair with lowest combined load
         """
+        topology, state = env.topology, env.state
         prob_list = [0.73, 0.15, 0.05, 0]
         aux_list = [0,0,0,0]
         aux_dict = []
@@ -274,7 +286,7 @@ def get_balanced_safest_dc(topology: 'Graph', service: 'Service') -> Tuple[bool,
         max_hops = 0
         path_hops = 0
         for iddc, dc in enumerate(topology.graph['dcs']):
-            if topology.nodes[dc]['available_units'] >= service.computing_units:
+            if state.node_available_units[dc] >= service.computing_units:
                 paths = topology.graph['ksp'][service.source, dc]
 
                 for path in paths:
@@ -284,38 +296,28 @@ def get_balanced_safest_dc(topology: 'Graph', service: 'Service') -> Tuple[bool,
 
                     
                 for idp, path in enumerate(paths):
-                    aux_list = [0,0,0,0]
-                    highest_prob = 0
-                    prob = 0            
                     f_var = 0
-                    for j in range(len(path.node_list)-1):
-                        #prob += float(topology[path.node_list[j]][path.node_list[j+1]]['current_failure_probability'])
-                        prob = float(topology[path.node_list[j]][path.node_list[j+1]]['current_failure_probability'])
-                        if prob > highest_prob:
-                            highest_prob = prob
-                        
+                    highest_prob = float(state.link_current_failure_probability[path.links].max())
                     #mean_prob = prob/(len(path.node_list)-1)
 
-                    for j in range(len(path.node_list)-1):
-                        for idx, prob in enumerate(prob_list):
-                            if float(topology[path.node_list[j]][path.node_list[j+1]]['current_failure_probability']) == prob:
-                                aux_list[idx]+=1
-                                #f_var = (0.95*((len(path.node_list)-1)/max_hops))+(highest_prob*0.05)
-                                f_var = (0.5*((len(path.node_list)-1)/max_hops))+(0.5*highest_prob)
-                                #f_var = (((len(path.node_list)-1)/max_hops))+(highest_prob)
+                    aux_list = get_risk_profile(state, path, prob_list)
+                    if sum(aux_list) > 0:  # f is only computed if some link has a known probability
+                        #f_var = (0.95*((len(path.node_list)-1)/max_hops))+(highest_prob*0.05)
+                        f_var = (0.5*((len(path.node_list)-1)/max_hops))+(0.5*highest_prob)
+                        #f_var = (((len(path.node_list)-1)/max_hops))+(highest_prob)
                     risk = aux_list.copy()
-                    if is_path_viable(topology, path, service.network_units) and f_var < lowest_f_var:
+                    if is_path_viable(state, path, service.network_units) and f_var < lowest_f_var:
                         lowest_risk=risk.copy()
                         lowest_f_var = f_var
                         safest_dc = dc
                         safest_path = path
                         found = True
-                        print("Lowest risk::", lowest_risk)
-                        print("Safest DC::", safest_dc)
-                        print(".")
+                        if tracing.routing:
+                            tracing.emit('routing', f'Lowest risk: {lowest_risk}\tSafest DC: {safest_dc}')
         return found, safest_dc, safest_path  # returns false and an index out of bounds if no path is available
 
-def get_balanced_sasfest_path(topology: 'Graph', service: 'Service') -> Optional['Path']:
+def get_balanced_sasfest_path(env: 'Environment', service: 'Service') -> Optional['Path']:
+    topology, state = env.topology, env.state
     if service.destination is None:
         raise ValueError(f"Service should have value for destination, got {service}")
     closest_path_hops = np.finfo(0.0).max
@@ -331,13 +333,13 @@ def get_balanced_sasfest_path(topology: 'Graph', service: 'Service') -> Optional
     num_hops: int = 0
     f_max: float = 100
     highest_prob = 0
-    if topology.nodes[service.destination]['available_units'] >= service.computing_units:
+    if state.node_available_units[service.destination] >= service.computing_units:
         #paths = topology.graph['prob_ksp'][service.source, service.destination]
         paths = topology.graph['ksp'][service.source, service.destination]
         
         for p in paths:
             num_hops = 0
-            if(is_path_viable(topology, p, service.network_units)):
+            if(is_path_viable(state, p, service.network_units)):
                 viable_paths.append(p)
                 num_hops = (len(p.node_list)-1)
                 if(num_hops>max_hops):
@@ -345,22 +347,12 @@ def get_balanced_sasfest_path(topology: 'Graph', service: 'Service') -> Optional
             
 
         for i, path in enumerate(viable_paths):
-            prob = 0
-            highest_prob = 0
-            for j in  range(len(path.node_list)-1):
-                #prob += float(topology[path.node_list[j]][path.node_list[j+1]]['current_failure_probability'])
-                
-                prob = float(topology[path.node_list[j]][path.node_list[j+1]]['current_failure_probability'])
-                if prob > highest_prob:
-                    highest_prob = prob
+            highest_prob = float(state.link_current_failure_probability[path.links].max())
             #mean_prob = prob/(len(path.node_list)-1)
 
             aux_list = [0,0,0,0,0,0]
             aux_list[4] = i  #Saves the Index in viable_paths list for further use
-            for j in range(len(path.node_list)-1):
-                for idx, prob in enumerate(prob_list):
-                    if float(topology[path.node_list[j]][path.node_list[j+1]]['current_failure_probability']) == prob:
-                        aux_list[idx]+=1
+            aux_list[:4] = get_risk_profile(state, path, prob_list)
             #f_var = (0.95*((len(path.node_list)-1)/max_hops))+(highest_prob*0.05)
             f_var = (0.5*((len(path.node_list)-1)/max_hops))+(0.5*highest_prob)
             #f_var = (((len(path.node_list)-1)/max_hops))+(highest_prob)
@@ -380,10 +372,11 @@ def get_balanced_sasfest_path(topology: 'Graph', service: 'Service') -> Optional
 
     return safest_path
 
-def get_dc_alfa_04(topology: 'Graph', service: 'Service') -> Tuple[bool, str, 'Path']:
+def get_dc_alfa_04(env: 'Environment', service: 'Service') -> Tuple[bool, str, 'Path']:
         """
         Finds the path+DC pair with lowest combined load
         """
+        topology, state = env.topology, env.state
         prob_list = [0.73, 0.15, 0.05, 0]
         aux_list = [0,0,0,0]
         aux_dict = []
@@ -397,7 +390,7 @@ def get_dc_alfa_04(topology: 'Graph', service: 'Service') -> Tuple[bool, str, 'P
         max_hops = 0
         path_hops = 0
         for iddc, dc in enumerate(topology.graph['dcs']):
-            if topology.nodes[dc]['available_units'] >= service.computing_units:
+            if state.node_available_units[dc] >= service.computing_units:
                 paths = topology.graph['ksp'][service.source, dc]
 
                 for path in paths:
@@ -407,38 +400,28 @@ def get_dc_alfa_04(topology: 'Graph', service: 'Service') -> Tuple[bool, str, 'P
 
                     
                 for idp, path in enumerate(paths):
-                    aux_list = [0,0,0,0]
-                    highest_prob = 0
-                    prob = 0            
                     f_var = 0
-                    for j in range(len(path.node_list)-1):
-                        #prob += float(topology[path.node_list[j]][path.node_list[j+1]]['current_failure_probability'])
-                        prob = float(topology[path.node_list[j]][path.node_list[j+1]]['current_failure_probability'])
-                        if prob > highest_prob:
-                            highest_prob = prob
-                        
+                    highest_prob = float(state.link_current_failure_probability[path.links].max())
                     #mean_prob = prob/(len(path.node_list)-1)
 
-                    for j in range(len(path.node_list)-1):
-                        for idx, prob in enumerate(prob_list):
-                            if float(topology[path.node_list[j]][path.node_list[j+1]]['current_failure_probability']) == prob:
-                                aux_list[idx]+=1
-                                #f_var = (0.95*((len(path.node_list)-1)/max_hops))+(highest_prob*0.05)
-                                f_var = (0.6*((len(path.node_list)-1)/max_hops))+(0.4*highest_prob)
-                                #f_var = (((len(path.node_list)-1)/max_hops))+(highest_prob)
+                    aux_list = get_risk_profile(state, path, prob_list)
+                    if sum(aux_list) > 0:  # f is only computed if some link has a known probability
+                        #f_var = (0.95*((len(path.node_list)-1)/max_hops))+(highest_prob*0.05)
+                        f_var = (0.6*((len(path.node_list)-1)/max_hops))+(0.4*highest_prob)
+                        #f_var = (((len(path.node_list)-1)/max_hops))+(highest_prob)
                     risk = aux_list.copy()
-                    if is_path_viable(topology, path, service.network_units) and f_var < lowest_f_var:
+                    if is_path_viable(state, path, service.network_units) and f_var < lowest_f_var:
                         lowest_risk=risk.copy()
                         lowest_f_var = f_var
                         safest_dc = dc
                         safest_path = path
                         found = True
-                        print("Lowest risk::", lowest_risk)
-                        print("Safest DC::", safest_dc)
-                        print(".")
+                        if tracing.routing:
+                            tracing.emit('routing', f'Lowest risk: {lowest_risk}\tSafest DC: {safest_dc}')
         return found, safest_dc, safest_path  # returns false and an index out of bounds if no path is available
 
-def get_path_alfa_04(topology: 'Graph', service: 'Service') -> Optional['Path']:
+def get_path_alfa_04(env: 'Environment', service: 'Service') -> Optional['Path']:
+    topology, state = env.topology, env.state
     if service.destination is None:
         raise ValueError(f"Service should have value for destination, got {service}")
     closest_path_hops = np.finfo(0.0).max
@@ -454,13 +437,13 @@ def get_path_alfa_04(topology: 'Graph', service: 'Service') -> Optional['Path']:
     num_hops: int = 0
     f_max: float = 100
     highest_prob = 0
-    if topology.nodes[service.destination]['available_units'] >= service.computing_units:
+    if state.node_available_units[service.destination] >= service.computing_units:
         #paths = topology.graph['prob_ksp'][service.source, service.destination]
         paths = topology.graph['ksp'][service.source, service.destination]
         
         for p in paths:
             num_hops = 0
-            if(is_path_viable(topology, p, service.network_units)):
+            if(is_path_viable(state, p, service.network_units)):
                 viable_paths.append(p)
                 num_hops = (len(p.node_list)-1)
                 if(num_hops>max_hops):
@@ -468,22 +451,12 @@ def get_path_alfa_04(topology: 'Graph', service: 'Service') -> Optional['Path']:
             
 
         for i, path in enumerate(viable_paths):
-            prob = 0
-            highest_prob = 0
-            for j in  range(len(path.node_list)-1):
-                #prob += float(topology[path.node_list[j]][path.node_list[j+1]]['current_failure_probability'])
-                
-                prob = float(topology[path.node_list[j]][path.node_list[j+1]]['current_failure_probability'])
-                if prob > highest_prob:
-                    highest_prob = prob
+            highest_prob = float(state.link_current_failure_probability[path.links].max())
             #mean_prob = prob/(len(path.node_list)-1)
 
             aux_list = [0,0,0,0,0,0]
             aux_list[4] = i  #Saves the Index in viable_paths list for further use
-            for j in range(len(path.node_list)-1):
-                for idx, prob in enumerate(prob_list):
-                    if float(topology[path.node_list[j]][path.node_list[j+1]]['current_failure_probability']) == prob:
-                        aux_list[idx]+=1
+            aux_list[:4] = get_risk_profile(state, path, prob_list)
             #f_var = (0.95*((len(path.node_list)-1)/max_hops))+(highest_prob*0.05)
             f_var = (0.6*((len(path.node_list)-1)/max_hops))+(0.4*highest_prob)
             #f_var = (((len(path.node_list)-1)/max_hops))+(highest_prob)
@@ -503,10 +476,11 @@ def get_path_alfa_04(topology: 'Graph', service: 'Service') -> Optional['Path']:
 
     return safest_path
 
-def get_dc_alfa_03(topology: 'Graph', service: 'Service') -> Tuple[bool, str, 'Path']:
+def get_dc_alfa_03(env: 'Environment', service: 'Service') -> Tuple[bool, str, 'Path']:
         """
         Finds the path+DC pair with lowest combined load
         """
+        topology, state = env.topology, env.state
         prob_list = [0.73, 0.15, 0.05, 0]
         aux_list = [0,0,0,0]
         aux_dict = []
@@ -520,7 +494,7 @@ def get_dc_alfa_03(topology: 'Graph', service: 'Service') -> Tuple[bool, str, 'P
         max_hops = 0
         path_hops = 0
         for iddc, dc in enumerate(topology.graph['dcs']):
-            if topology.nodes[dc]['available_units'] >= service.computing_units:
+            if state.node_available_units[dc] >= service.computing_units:
                 paths = topology.graph['ksp'][service.source, dc]
 
                 for path in paths:
@@ -530,38 +504,28 @@ def get_dc_alfa_03(topology: 'Graph', service: 'Service') -> Tuple[bool, str, 'P
 
                     
                 for idp, path in enumerate(paths):
-                    aux_list = [0,0,0,0]
-                    highest_prob = 0
-                    prob = 0            
                     f_var = 0
-                    for j in range(len(path.node_list)-1):
-                        #prob += float(topology[path.node_list[j]][path.node_list[j+1]]['current_failure_probability'])
-                        prob = float(topology[path.node_list[j]][path.node_list[j+1]]['current_failure_probability'])
-                        if prob > highest_prob:
-                            highest_prob = prob
-                        
+                    highest_prob = float(state.link_current_failure_probability[path.links].max())
                     #mean_prob = prob/(len(path.node_list)-1)
 
-                    for j in range(len(path.node_list)-1):
-                        for idx, prob in enumerate(prob_list):
-                            if float(topology[path.node_list[j]][path.node_list[j+1]]['current_failure_probability']) == prob:
-                                aux_list[idx]+=1
-                                #f_var = (0.95*((len(path.node_list)-1)/max_hops))+(highest_prob*0.05)
-                                f_var = (0.7*((len(path.node_list)-1)/max_hops))+(0.3*highest_prob)
-                                #f_var = (((len(path.node_list)-1)/max_hops))+(highest_prob)
+                    aux_list = get_risk_profile(state, path, prob_list)
+                    if sum(aux_list) > 0:  # f is only computed if some link has a known probability
+                        #f_var = (0.95*((len(path.node_list)-1)/max_hops))+(highest_prob*0.05)
+                        f_var = (0.7*((len(path.node_list)-1)/max_hops))+(0.3*highest_prob)
+                        #f_var = (((len(path.node_list)-1)/max_hops))+(highest_prob)
                     risk = aux_list.copy()
-                    if is_path_viable(topology, path, service.network_units) and f_var < lowest_f_var:
+                    if is_path_viable(state, path, service.network_units) and f_var < lowest_f_var:
                         lowest_risk=risk.copy()
                         lowest_f_var = f_var
                         safest_dc = dc
                         safest_path = path
                         found = True
-                        print("Lowest risk::", lowest_risk)
-                        print("Safest DC::", safest_dc)
-                        print(".")
+                        if tracing.routing:
+                            tracing.emit('routing', f'Lowest risk: {lowest_risk}\tSafest DC: {safest_dc}')
         return found, safest_dc, safest_path  # returns false and an index out of bounds if no path is available
 
-def get_path_alfa_03(topology: 'Graph', service: 'Service') -> Optional['Path']:
+def get_path_alfa_03(env: 'Environment', service: 'Service') -> Optional['Path']:
+    topology, state = env.topology, env.state
     if service.destination is None:
         raise ValueError(f"Service should have value for destination, got {service}")
     closest_path_hops = np.finfo(0.0).max
@@ -577,13 +541,13 @@ def get_path_alfa_03(topology: 'Graph', service: 'Service') -> Optional['Path']:
     num_hops: int = 0
     f_max: float = 100
     highest_prob = 0
-    if topology.nodes[service.destination]['available_units'] >= service.computing_units:
+    if state.node_available_units[service.destination] >= service.computing_units:
         #paths = topology.graph['prob_ksp'][service.source, service.destination]
         paths = topology.graph['ksp'][service.source, service.destination]
         
         for p in paths:
             num_hops = 0
-            if(is_path_viable(topology, p, service.network_units)):
+            if(is_path_viable(state, p, service.network_units)):
                 viable_paths.append(p)
                 num_hops = (len(p.node_list)-1)
                 if(num_hops>max_hops):
@@ -591,22 +555,12 @@ def get_path_alfa_03(topology: 'Graph', service: 'Service') -> Optional['Path']:
             
 
         for i, path in enumerate(viable_paths):
-            prob = 0
-            highest_prob = 0
-            for j in  range(len(path.node_list)-1):
-                #prob += float(topology[path.node_list[j]][path.node_list[j+1]]['current_failure_probability'])
-                
-                prob = float(topology[path.node_list[j]][path.node_list[j+1]]['current_failure_probability'])
-                if prob > highest_prob:
-                    highest_prob = prob
+            highest_prob = float(state.link_current_failure_probability[path.links].max())
             #mean_prob = prob/(len(path.node_list)-1)
 
             aux_list = [0,0,0,0,0,0]
             aux_list[4] = i  #Saves the Index in viable_paths list for further use
-            for j in range(len(path.node_list)-1):
-                for idx, prob in enumerate(prob_list):
-                    if float(topology[path.node_list[j]][path.node_list[j+1]]['current_failure_probability']) == prob:
-                        aux_list[idx]+=1
+            aux_list[:4] = get_risk_profile(state, path, prob_list)
             #f_var = (0.95*((len(path.node_list)-1)/max_hops))+(highest_prob*0.05)
             f_var = (0.7*((len(path.node_list)-1)/max_hops))+(0.3*highest_prob)
             #f_var = (((len(path.node_list)-1)/max_hops))+(highest_prob)
@@ -625,10 +579,11 @@ def get_path_alfa_03(topology: 'Graph', service: 'Service') -> Optional['Path']:
             safest_path = None
 
     return safest_path
-def get_dc_alfa_01(topology: 'Graph', service: 'Service') -> Tuple[bool, str, 'Path']:
+def get_dc_alfa_01(env: 'Environment', service: 'Service') -> Tuple[bool, str, 'Path']:
         """
         Finds the path+DC pair with lowest combined load
         """
+        topology, state = env.topology, env.state
         prob_list = [0.73, 0.15, 0.05, 0]
         aux_list = [0,0,0,0]
         aux_dict = []
@@ -642,7 +597,7 @@ def get_dc_alfa_01(topology: 'Graph', service: 'Service') -> Tuple[bool, str, 'P
         max_hops = 0
         path_hops = 0
         for iddc, dc in enumerate(topology.graph['dcs']):
-            if topology.nodes[dc]['available_units'] >= service.computing_units:
+            if state.node_available_units[dc] >= service.computing_units:
                 paths = topology.graph['ksp'][service.source, dc]
 
                 for path in paths:
@@ -652,38 +607,28 @@ def get_dc_alfa_01(topology: 'Graph', service: 'Service') -> Tuple[bool, str, 'P
 
                     
                 for idp, path in enumerate(paths):
-                    aux_list = [0,0,0,0]
-                    highest_prob = 0
-                    prob = 0            
                     f_var = 0
-                    for j in range(len(path.node_list)-1):
-                        #prob += float(topology[path.node_list[j]][path.node_list[j+1]]['current_failure_probability'])
-                        prob = float(topology[path.node_list[j]][path.node_list[j+1]]['current_failure_probability'])
-                        if prob > highest_prob:
-                            highest_prob = prob
-                        
+                    highest_prob = float(state.link_current_failure_probability[path.links].max())
                     #mean_prob = prob/(len(path.node_list)-1)
 
-                    for j in range(len(path.node_list)-1):
-                        for idx, prob in enumerate(prob_list):
-                            if float(topology[path.node_list[j]][path.node_list[j+1]]['current_failure_probability']) == prob:
-                                aux_list[idx]+=1
-                                #f_var = (0.95*((len(path.node_list)-1)/max_hops))+(highest_prob*0.05)
-                                f_var = (0.9*((len(path.node_list)-1)/max_hops))+(0.1*highest_prob)
-                                #f_var = (((len(path.node_list)-1)/max_hops))+(highest_prob)
+                    aux_list = get_risk_profile(state, path, prob_list)
+                    if sum(aux_list) > 0:  # f is only computed if some link has a known probability
+                        #f_var = (0.95*((len(path.node_list)-1)/max_hops))+(highest_prob*0.05)
+                        f_var = (0.9*((len(path.node_list)-1)/max_hops))+(0.1*highest_prob)
+                        #f_var = (((len(path.node_list)-1)/max_hops))+(highest_prob)
                     risk = aux_list.copy()
-                    if is_path_viable(topology, path, service.network_units) and f_var < lowest_f_var:
+                    if is_path_viable(state, path, service.network_units) and f_var < lowest_f_var:
                         lowest_risk=risk.copy()
                         lowest_f_var = f_var
                         safest_dc = dc
                         safest_path = path
                         found = True
-                        print("Lowest risk::", lowest_risk)
-                        print("Safest DC::", safest_dc)
-                        print(".")
+                        if tracing.routing:
+                            tracing.emit('routing', f'Lowest risk: {lowest_risk}\tSafest DC: {safest_dc}')
         return found, safest_dc, safest_path  # returns false and an index out of bounds if no path is available
 
-def get_path_alfa_01(topology: 'Graph', service: 'Service') -> Optional['Path']:
+def get_path_alfa_01(env: 'Environment', service: 'Service') -> Optional['Path']:
+    topology, state = env.topology, env.state
     if service.destination is None:
         raise ValueError(f"Service should have value for destination, got {service}")
     closest_path_hops = np.finfo(0.0).max
@@ -699,13 +644,13 @@ def get_path_alfa_01(topology: 'Graph', service: 'Service') -> Optional['Path']:
     num_hops: int = 0
     f_max: float = 100
     highest_prob = 0
-    if topology.nodes[service.destination]['available_units'] >= service.computing_units:
+    if state.node_available_units[service.destination] >= service.computing_units:
         #paths = topology.graph['prob_ksp'][service.source, service.destination]
         paths = topology.graph['ksp'][service.source, service.destination]
         
         for p in paths:
             num_hops = 0
-            if(is_path_viable(topology, p, service.network_units)):
+            if(is_path_viable(state, p, service.network_units)):
                 viable_paths.append(p)
                 num_hops = (len(p.node_list)-1)
                 if(num_hops>max_hops):
@@ -713,22 +658,12 @@ def get_path_alfa_01(topology: 'Graph', service: 'Service') -> Optional['Path']:
             
 
         for i, path in enumerate(viable_paths):
-            prob = 0
-            highest_prob = 0
-            for j in  range(len(path.node_list)-1):
-                #prob += float(topology[path.node_list[j]][path.node_list[j+1]]['current_failure_probability'])
-                
-                prob = float(topology[path.node_list[j]][path.node_list[j+1]]['current_failure_probability'])
-                if prob > highest_prob:
-                    highest_prob = prob
+            highest_prob = float(state.link_current_failure_probability[path.links].max())
             #mean_prob = prob/(len(path.node_list)-1)
 
             aux_list = [0,0,0,0,0,0]
             aux_list[4] = i  #Saves the Index in viable_paths list for further use
-            for j in range(len(path.node_list)-1):
-                for idx, prob in enumerate(prob_list):
-                    if float(topology[path.node_list[j]][path.node_list[j+1]]['current_failure_probability']) == prob:
-                        aux_list[idx]+=1
+            aux_list[:4] = get_risk_profile(state, path, prob_list)
             #f_var = (0.95*((len(path.node_list)-1)/max_hops))+(highest_prob*0.05)
             f_var = (0.9*((len(path.node_list)-1)/max_hops))+(0.1*highest_prob)
             #f_var = (((len(path.node_list)-1)/max_hops))+(highest_prob)
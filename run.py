@@ -1,5 +1,4 @@
 import argparse
-import copy
 import pickle
 import datetime
 import time
@@ -9,25 +8,54 @@ import git
 import os
 import numpy as np
 from multiprocessing import Pool
-from multiprocessing import Manager
 
 import core
 import graph
 import plots
+import profiling
 import routing_policies
 import restoration_policies
+import restoration_log
+import tracing
 
 import logging
-logging.basicConfig(format='%(asctime)s\t%(name)-12s\t%(threadName)s\t%(message)s', level=logging.DEBUG)
+logging.basicConfig(format='%(asctime)s\t%(name)-12s\t%(threadName)s\t%(message)s', level=logging.INFO)
+
+
+def replication_cost(env):
+    """
+    Expected duration of one replication of `env`, in arbitrary units.
+    It grows with the number of arrivals and with the load, as higher loads keep more services running and
+    more services to restore per disaster, and with the number of (DC, path) candidates of each route,
+    i.e., the number of paths times the number of DCs. All routing and restoration policies weigh the same.
+    """
+    return env.num_arrivals * env.load * env.k_paths * env.num_dcs
+
+
+def schedule_replications(envs):
+    """
+    Splits each configuration into one task per seed, i.e., an (env, seed) tuple for `core.run_replication`.
+    Tasks are ordered by their expected duration (`replication_cost`), longest first, so that the longest
+    replications do not end up alone at the tail of the pool.
+    """
+    tasks = [(env, seed) for env in envs for seed in range(env.num_seeds)]
+    # sorted is stable, so replications with the same expected duration keep the configuration order
+    return sorted(tasks, key=lambda task: replication_cost(task[0]), reverse=True)
 
 
 def run(uargs):
     start_time = time.time()
 
-    topology = graph.get_topology(uargs)
-    topology = graph.get_dcs(uargs, topology)
-    topology = graph.get_ksp(uargs, topology)
-    topology = graph.get_probability_ksp(uargs, topology)    
+    if uargs.topology_bundle:
+        # the workers memory-map the compiled topology instead of receiving a pickled copy
+        topology = graph.load_topology(uargs)
+        worker_topology = graph.get_topology_bundle_folder(uargs)
+    else:
+        topology = graph.get_topology(uargs)
+        topology = graph.get_dcs(uargs, topology)
+        topology = graph.get_ksp(uargs, topology)
+        topology = graph.get_probability_ksp(uargs, topology)
+        worker_topology = topology
     env = core.Environment(uargs, topology=topology)
 
     logger = logging.getLogger('run')
@@ -46,7 +74,7 @@ def run(uargs):
 
     if not os.path.isdir('./results/' + env.output_folder):
         os.makedirs('./results/' + env.output_folder)
-        logger.debug(f'creating folder {env.output_folder}')
+        logger.info(f'creating folder {env.output_folder}')
     
     # creating a graphical representation of the topology
     plots.plot_topology(env, args)
@@ -67,15 +95,14 @@ def run(uargs):
 
     # copy current version of files
     shutil.copytree('./', f'./results/{env.output_folder}/source-code/',
-                    ignore=shutil.ignore_patterns('__pycache__', '*.pyc', '*.md', 'results', 'LICENSE', '*.ipynb', '.git', '.idea', '.gitignore'))
+                    ignore=shutil.ignore_patterns('__pycache__', '*.pyc', '*.md', 'results', 'LICENSE', '*.ipynb', '.git', '.idea', '.gitignore', 'cache', 'compiled'))
 
-    # preparing the thread-safe data structure to hold the results
-    manager = Manager()
-    results = manager.dict()
+    # results are kept by the main process, which receives the record of each replication from the pool
+    results = {}
     for routing_policy in exec_routing_policies:
-        results[routing_policy] = manager.dict()
+        results[routing_policy] = {}
         for restoration_policy in exec_restoration_policies:
-            results[routing_policy][restoration_policy] = {load: manager.list() for load in loads}
+            results[routing_policy][restoration_policy] = {load: [] for load in loads}
 
     envs = []
     for routing_policy in exec_routing_policies:  # runs the simulations for every routing policy
@@ -113,10 +140,8 @@ def run(uargs):
                 else:
                     raise ValueError('Restoration policy was not configured correctly (value set to {})'.format(restoration_policy))
 
-                env_topology = copy.deepcopy(topology) # makes a deep copy of the topology object
+                # the topology is not copied into each environment, as it is static and shared by the workers
                 env_t = core.Environment(uargs,
-                                        topology=env_topology,
-                                        results=results,
                                         load=load,
                                         routing_policy=routing_policy_instance,
                                         restoration_policy=restoration_policy_instance,
@@ -128,46 +153,46 @@ def run(uargs):
                 # if load == 600 and routing_policy == 'CADC':
                 
                 ''' 
+                env_t.topology = topology
                 core.run_simulation(env_t)
                 print("Ran in debug mode... exiting...")
                 exit(0)
                 '''
-    logger.debug(f'Starting pool of simulators with {uargs.threads} threads')
-    # use the code above to keep updating the final plot as the simulation progresses
-    with Pool(processes=uargs.threads) as p:
-        result_pool = p.map_async(core.run_simulation, envs)
-        p.close()
-
-        done = False
-        while not done:
-            if result_pool.ready():
-                done = True
-            else:
-                time.sleep(uargs.temporary_plot_every)
-                plots.plot_final_results(env, results, start_time)
-
-    # if you do not want periodical updates, you can use the following code
-    # with Pool(processes=uargs.threads) as p:
-    #     p.map(core.run_simulation, envs)
-    #     p.close()
-    #     p.join()
-    #     logging.debug("Finished the threads")
+    tasks = schedule_replications(envs)
+    profiles = {}
+    logger.info(f'Starting pool of simulators with {uargs.threads} threads for {len(tasks)} replications')
+    # the final plot is updated periodically as the records of the replications arrive
+    try:
+        with Pool(processes=uargs.threads, initializer=core.init_worker, initargs=(worker_topology, tracing.get_categories())) as p:
+            # chunksize=1 hands out the replications one at a time, in the order of the schedule
+            last_plot = time.time()
+            for routing_policy, restoration_policy, load, record, profile in \
+                    p.imap_unordered(core.run_replication, tasks, chunksize=1):
+                if profile is not None:  # profiles are written to their own file
+                    profiles[routing_policy, restoration_policy, load, record['id_simulation']] = profile
+                results[routing_policy][restoration_policy][load].append(record)
+                if time.time() - last_plot > uargs.temporary_plot_every:
+                    plots.plot_final_results(env, results, start_time)
+                    last_plot = time.time()
+    finally:
+        # the restoration logs of the workers are joined only now, so their records never interleave,
+        # and also if a replication fails, so the records of the other replications are kept
+        restoration_log.merge_restoration_logs(env.output_folder)
+
+    # replications finish in any order, so they are put back in seed order
+    for routing_policy in results.values():
+        for restoration_policy in routing_policy.values():
+            for records in restoration_policy.values():
+                records.sort(key=lambda record: record['id_simulation'])
 
     # consolidating statistics
     plots.plot_final_results(env, results, start_time)
 
     with open('./results/{}/final_results.h5'.format(env.output_folder), 'wb') as file:
-        realized_results = dict(results)
-        for k1, v1 in results.items():
-            realized_results[k1] = dict(v1)
-            for k2, v2 in results[k1].items():
-                realized_results[k1][k2] = dict(v2)
-                for k3, v3 in results[k1][k2].items():
-                    realized_results[k1][k2][k3] = list(v3)
         pickle.dump({
             'args': uargs,
             'env': env,
-            'results': realized_results,
+            'results': results,
             'routing_policies': [policy for policy in exec_routing_policies],
             'restoration_policies': [policy for policy in exec_restoration_policies],
             'loads': loads,
@@ -175,7 +200,10 @@ def run(uargs):
             'datetime': datetime.datetime.fromtimestamp(time.time())
         }, file)
 
-    logger.debug('Finishing simulation after {}'.format(datetime.timedelta(seconds=(time.time() - start_time))))
+    if uargs.profile:
+        profiling.write_profiles(env.output_folder, profiles)
+
+    logger.info('Finishing simulation after {}'.format(datetime.timedelta(seconds=(time.time() - start_time))))
 
 
 if __name__ == '__main__':
@@ -184,6 +212,12 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('--plot_simulation_progress', default=False, action='store_true',
                         help='Plot summary for each seed simulated (default=False)')
+    parser.add_argument('--compact_services', default=False, action='store_true',
+                        help='Store services in preallocated NumPy columns instead of one object per arrival (default=False)')
+    parser.add_argument('--no_ksp_cache', dest='ksp_cache', default=True, action='store_false',
+                        help='Compute the topology and its k-shortest paths instead of reading them from the cache folders (default=False)')
+    parser.add_argument('--no_topology_bundle', dest='topology_bundle', default=True, action='store_false',
+                        help='Build the topology in each run instead of loading its compiled bundle from config/compiled (default=False)')
     parser.add_argument('-tf', '--topology_file', default=env.topology_file, help='Network topology file to be used')
     parser.add_argument('-a', '--num_arrivals', type=int, default=env.num_arrivals,
                         help='Number of arrivals per episode to be generated (default={})'.format(env.num_arrivals))
@@ -215,5 +249,10 @@ if __name__ == '__main__':
                         help='Number of disasters to occur for each seed simulated'.format(env.number_disaster_occurences))
     parser.add_argument('-fd', '--failure_duration', default=env.mean_failure_duration,
                         help='Mean failure or disaster duration'.format(env.mean_failure_duration))
+    parser.add_argument('--profile', default=False, action='store_true',
+                        help='Record the time spent in each event handler and policy, written to profile.h5 and profile.txt (default=False)')
+    parser.add_argument('--trace', nargs='+', default=[], choices=tracing.CATEGORIES + ('all',),
+                        help='Categories of debug messages to trace (default=none)')
     args = parser.parse_args()
+    tracing.configure(args.trace)
     run(args)
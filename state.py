@@ -0,0 +1,188 @@
+import typing
+from typing import Dict, List, Tuple
+import numpy as np
+from graph import pad_indices
+if typing.TYPE_CHECKING:
+    from networkx import Graph
+    from core import Service
+    from graph import Path
+
+
+class TopologyTables:
+    """
+    Static index tables of a topology: link indices, DC flags, the links and nodes of every path and the
+    inverted index from links and nodes to paths. They only depend on the topology and its k-shortest paths,
+    so they are built once and shared by all the network states of the topology, see `get_topology_tables`.
+    """
+
+    def __init__(self, topology: 'Graph'):
+        # maps both directions of a link to its index
+        self.link_index: Dict[Tuple[int, int], int] = {}
+        for n1, n2, idx in topology.edges(data='id'):
+            self.link_index[n1, n2] = idx
+            self.link_index[n2, n1] = idx
+
+        self.num_links: int = topology.number_of_edges()
+        self.num_nodes: int = topology.number_of_nodes()
+
+        # datacenters are the only nodes with computing resources
+        self.node_is_dc: np.ndarray = np.zeros(self.num_nodes, dtype=bool)
+        self.node_is_dc[topology.graph['dcs']] = True
+        self.node_is_dc.flags.writeable = False
+
+        paths = topology.graph.get('paths', [])
+        self.num_paths: int = len(paths)
+        self.path_links: np.ndarray = pad_indices([path.links for path in paths])
+        self.path_nodes: np.ndarray = pad_indices([path.nodes for path in paths])
+        # inverted index: paths traversing each link and each node
+        link_paths: List[list] = [[] for _ in range(self.num_links)]
+        node_paths: List[list] = [[] for _ in range(self.num_nodes)]
+        for path in paths:
+            for link in path.links:
+                link_paths[link].append(path.id)
+            for node in path.nodes:
+                node_paths[node].append(path.id)
+        self.link_paths: List[np.ndarray] = [np.array(ids, dtype=np.int64) for ids in link_paths]
+        self.node_paths: List[np.ndarray] = [np.array(ids, dtype=np.int64) for ids in node_paths]
+        # paths sharing at least one link with a given path, computed when first needed
+        self.neighbour_paths: Dict[int, np.ndarray] = {}
+
+
+def get_topology_tables(topology: 'Graph') -> TopologyTables:
+    """
+    Returns the static tables of the topology, building them at the first call.
+    The tables are kept in `topology.graph['tables']`, so they travel with the topology to the worker processes.
+    """
+    if 'tables' not in topology.graph:
+        topology.graph['tables'] = TopologyTables(topology)
+    return topology.graph['tables']
+
+
+class NetworkState:
+    """
+    Mutable resource state of the links and nodes of a topology, kept in contiguous arrays.
+    Links are indexed by the `id` edge attribute (the position of the edge in `topology.edges()`)
+    and nodes by their integer id.
+    The networkx graph only holds the static description of the topology.
+
+    For every path in `topology.graph['paths']`, the state also keeps its bottleneck (the lowest
+    number of available units among its links) and whether any of its links or nodes is failed.
+    These are updated through an inverted index from links and nodes to the paths traversing them
+    whenever resources are allocated, released or fail, so that checking if a path is viable is O(1).
+    Resources and failures should therefore be changed through the methods of this class.
+
+    The static tables of the topology (see TopologyTables) are shared, and only the arrays
+    describing the current state are allocated for each network state.
+    """
+
+    def __init__(self, topology: 'Graph'):
+        tables = get_topology_tables(topology)
+        self.link_index: Dict[Tuple[int, int], int] = tables.link_index
+        self.num_links: int = tables.num_links
+        self.num_nodes: int = tables.num_nodes
+        self.node_is_dc: np.ndarray = tables.node_is_dc
+        self.path_links: np.ndarray = tables.path_links
+        self.path_nodes: np.ndarray = tables.path_nodes
+        self.link_paths: List[np.ndarray] = tables.link_paths
+        self.node_paths: List[np.ndarray] = tables.node_paths
+        self._neighbour_paths: Dict[int, np.ndarray] = tables.neighbour_paths
+
+        self.link_available_units: np.ndarray = np.zeros(self.num_links, dtype=np.int64)
+        self.link_total_units: np.ndarray = np.zeros(self.num_links, dtype=np.int64)
+        self.link_failed: np.ndarray = np.zeros(self.num_links, dtype=bool)
+        self.link_utilization: np.ndarray = np.zeros(self.num_links, dtype=np.float64)
+        self.link_last_update: np.ndarray = np.zeros(self.num_links, dtype=np.float64)
+        self.link_current_failure_probability: np.ndarray = np.zeros(self.num_links, dtype=np.float64)
+        # running services are kept by service id, in the order they were provisioned
+        self.link_running_services: List[Dict[int, 'Service']] = [{} for _ in range(self.num_links)]
+
+        self.node_available_units: np.ndarray = np.zeros(self.num_nodes, dtype=np.int64)
+        self.node_total_units: np.ndarray = np.zeros(self.num_nodes, dtype=np.int64)
+        self.node_failed: np.ndarray = np.zeros(self.num_nodes, dtype=bool)
+        self.node_utilization: np.ndarray = np.zeros(self.num_nodes, dtype=np.float64)
+        self.node_last_update: np.ndarray = np.zeros(self.num_nodes, dtype=np.float64)
+        self.node_running_services: List[Dict[int, 'Service']] = [{} for _ in range(self.num_nodes)]
+
+        self.path_bottleneck: np.ndarray = np.zeros(tables.num_paths, dtype=np.int64)
+        self.path_failed: np.ndarray = np.zeros(tables.num_paths, dtype=bool)
+
+    def reset(self, link_units: int, dc_units: int) -> None:
+        """
+        Puts all links and nodes back to their initial (idle and working) state.
+
+        Args:
+            link_units (int): Number of resource units of each link.
+            dc_units (int): Number of computing units of each datacenter.
+        """
+        self.link_available_units[:] = link_units
+        self.link_total_units[:] = link_units
+        self.link_failed[:] = False
+        self.link_utilization[:] = 0.0
+        self.link_last_update[:] = 0.0
+        self.link_current_failure_probability[:] = 0.0
+        self.link_running_services = [{} for _ in range(self.num_links)]
+
+        self.node_available_units[:] = np.where(self.node_is_dc, dc_units, 0)
+        self.node_total_units[:] = self.node_available_units
+        self.node_failed[:] = False
+        self.node_utilization[:] = 0.0
+        self.node_last_update[:] = 0.0
+        self.node_running_services = [{} for _ in range(self.num_nodes)]
+
+        self.path_bottleneck[:] = link_units
+        self.path_failed[:] = False
+
+    def allocate(self, path: 'Path', units: int) -> None:
+        """
+        Takes `units` resource units from every link of the path.
+        """
+        self.link_available_units[path.links] -= units
+        self._update_bottlenecks(self._get_neighbour_paths(path))
+
+    def release(self, path: 'Path', units: int) -> None:
+        """
+        Gives `units` resource units back to every link of the path.
+        """
+        self.link_available_units[path.links] += units
+        self._update_bottlenecks(self._get_neighbour_paths(path))
+
+    def release_links(self, links: np.ndarray, units: np.ndarray) -> None:
+        """
+        Gives `units[i]` resource units back to link `links[i]`, for all i at once.
+        Links can repeat, e.g., when releasing several paths sharing links.
+        """
+        if len(links) > 0:
+            np.add.at(self.link_available_units, links, units)
+            self._update_bottlenecks(np.unique(np.concatenate([self.link_paths[link] for link in np.unique(links)])))
+
+    def drain_link_services(self, link: int) -> List['Service']:
+        """
+        Removes and returns all the services running over a link, in the order they were provisioned.
+        """
+        services = list(self.link_running_services[link].values())
+        self.link_running_services[link].clear()
+        return services
+
+    def set_link_failed(self, link: int, failed: bool) -> None:
+        self.link_failed[link] = failed
+        self._update_failures(self.link_paths[link])
+
+    def set_node_failed(self, node: int, failed: bool) -> None:
+        self.node_failed[node] = failed
+        self._update_failures(self.node_paths[node])
+
+    def _get_neighbour_paths(self, path: 'Path') -> np.ndarray:
+        if path.id is None:  # path not indexed, e.g., computed outside the k-shortest paths
+            return np.unique(np.concatenate([self.link_paths[link] for link in path.links]))
+        if path.id not in self._neighbour_paths:
+            self._neighbour_paths[path.id] = np.unique(np.concatenate([self.link_paths[link] for link in path.links]))
+        return self._neighbour_paths[path.id]
+
+    def _update_bottlenecks(self, paths: np.ndarray) -> None:
+        if len(paths) > 0:
+            self.path_bottleneck[paths] = self.link_available_units[self.path_links[paths]].min(axis=1)
+
+    def _update_failures(self, paths: np.ndarray) -> None:
+        if len(paths) > 0:
+            self.path_failed[paths] = self.link_failed[self.path_links[paths]].any(axis=1) \
+                | self.node_failed[self.path_nodes[paths]].any(axis=1)
@@ -0,0 +1,35 @@
+import argparse
+import random
+from itertools import islice
+
+import networkx as nx
+import pytest
+
+import graph
+
+TOPOLOGIES = ['usanw.xml', 'usanw_20.xml', 'usanw_new.xml', 'usanw_old_20.xml', 'bigusanw.xml', 'nobel-us.xml']
+
+
+@pytest.fixture(scope='module', params=TOPOLOGIES)
+def topology(request):
+    return graph.get_topology(argparse.Namespace(topology_file=request.param))
+
+
+def reference_length(topology, path, weight):
+    if weight is None:
+        return len(path)  # networkx measures unweighted paths by their number of nodes
+    return nx.path_weight(topology, path, weight)
+
+
+@pytest.mark.parametrize('weight', [None, 'weight', 'length', 'link_failure_probability'])
+def test_k_shortest_paths_matches_networkx(topology, weight):
+    k = 10
+    engine = graph.KShortestPaths(topology, weight)
+    pairs = [(source, target) for source in topology.nodes() for target in topology.nodes() if source != target]
+    # a fixed sample of the pairs keeps the networkx reference fast enough
+    for source, target in random.Random(0).sample(pairs, min(len(pairs), 40)):
+        paths = engine.get(source, target, k)
+        expected = list(islice(nx.shortest_simple_paths(topology, source, target, weight=weight), k))
+        assert paths == expected, (source, target)
+        assert [engine._get_length(path) for path in paths] == \
+            pytest.approx([reference_length(topology, path, weight) for path in expected]), (source, target)
@@ -0,0 +1,86 @@
+import argparse
+import random
+
+import numpy as np
+import pytest
+
+import core
+import graph
+import restoration_policies
+import routing_policies
+
+
+@pytest.fixture(scope='module')
+def env():
+    args = argparse.Namespace(topology_file='usanw_20.xml', k_paths=10, num_dcs=3, dc_placement='fixed',
+                              threads=1, ksp_cache=False, output_folder='test')
+    topology = graph.get_topology(args)
+    topology = graph.get_dcs(args, topology)
+    topology = graph.get_ksp(args, topology)
+    topology = graph.get_probability_ksp(args, topology)
+    env = core.Environment(args, topology=topology, load=700, seed=42,
+                           routing_policy=routing_policies.ClosestAvailableDC(),
+                           restoration_policy=restoration_policies.PathRestorationWithRelocationPolicy())
+    env.reset(seed=42)
+    return env
+
+
+def reference_route(env, service):
+    """
+    Nested loop over the DCs and their k paths used by ClosestAvailableDC before the hop-sorted candidates,
+    with the viability of each path computed from the link and node arrays.
+    """
+    state = env.state
+    found = False
+    closest_path_hops = np.finfo(0.0).max
+    closest_dc = None
+    closest_path = None
+    for dc in env.topology.graph['dcs']:
+        if state.node_available_units[dc] >= service.computing_units:
+            for path in env.topology.graph['ksp'][service.source, dc]:
+                viable = state.link_available_units[path.links].min() >= service.network_units \
+                    and not state.link_failed[path.links].any() and not state.node_failed[path.nodes].any()
+                if viable and closest_path_hops > path.hops:
+                    closest_path_hops = path.hops
+                    closest_dc = dc
+                    closest_path = path
+                    found = True
+    return found, closest_dc, closest_path
+
+
+def load_network(env, rng):
+    """
+    Puts the network in a random state: paths carrying traffic, DCs partially used and a few failed links.
+    """
+    state = env.state
+    state.reset(env.resource_units_per_link, env.dc_units)
+    paths = env.topology.graph['paths']
+    for _ in range(rng.randrange(0, 4 * len(paths))):
+        path = rng.choice(paths)
+        bottleneck = int(state.link_available_units[path.links].min())
+        if bottleneck > 0:
+            state.allocate(path, rng.randint(1, bottleneck))
+    for dc in env.topology.graph['dcs']:
+        state.node_available_units[dc] = rng.choice((0, rng.randint(1, 5), env.dc_units))
+    for link in rng.sample(range(state.num_links), rng.randrange(0, 4)):
+        state.set_link_failed(link, True)
+
+
+def test_closest_available_dc_matches_nested_loop(env):
+    rng = random.Random(0)
+    policy = env.routing_policy
+    priority_class = core.PriorityClass(priority=1)
+    num_found = 0
+    for service_id in range(5000):
+        if service_id % 50 == 0:
+            load_network(env, rng)
+        service = core.Service(service_id, 0.0, 1.0, rng.choice(env.topology.graph['source_nodes']), priority_class,
+                               computing_units=rng.randint(1, 5), network_units=rng.randint(1, 3))
+        found, dc, path = policy.route(service)
+        expected_found, expected_dc, expected_path = reference_route(env, service)
+        assert found == expected_found
+        assert dc == expected_dc
+        assert path is expected_path
+        num_found += found
+    # both outcomes are exercised
+    assert 0 < num_found < 5000
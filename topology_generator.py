@@ -0,0 +1,219 @@
+"""
+Generates synthetic topologies in the SNDlib format read by `graph.read_sndlib_topology`, with
+concentric disaster zones in the format read by `graph.read_zone_table`, to study how the simulator
+scales to topologies much larger than the ones in `config/topologies`.
+
+Example, generating a random topology with 1000 nodes and running it:
+
+    python topology_generator.py -n 1000 --degree 3.5 -d 5
+    python run.py -tf synthetic_random_1000.xml --dc_placement degree -d 5
+"""
+import argparse
+import os
+import xml.etree.ElementTree as ET
+import networkx as nx
+import numpy as np
+
+# failure probability of the links in each of the concentric regions of a disaster zone, from the epicenter outwards
+ZONE_PROBABILITIES = (1.0, 0.73, 0.15, 0.05)
+
+# longitude and latitude of the area where the nodes are placed, roughly the contiguous United States
+AREA = ((-124.0, -68.0), (26.0, 48.0))
+
+
+def _nearest_neighbours(pos, k, chunk_size=1024):
+    """
+    Returns, for each node, its k nearest nodes sorted by distance, computed in chunks to bound memory.
+    """
+    k = min(k, len(pos) - 1)
+    neighbours = np.empty((len(pos), k), dtype=np.int64)
+    for start in range(0, len(pos), chunk_size):
+        distances = np.linalg.norm(pos[start:start + chunk_size, None, :] - pos[None, :, :], axis=2)
+        distances[np.arange(len(distances)), np.arange(start, start + len(distances))] = np.inf
+        nearest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        order = np.argsort(np.take_along_axis(distances, nearest, axis=1), axis=1, kind='stable')
+        neighbours[start:start + chunk_size] = np.take_along_axis(nearest, order, axis=1)
+    return neighbours
+
+
+def _connect_components(topology, pos):
+    """
+    Links every connected component to the nearest node outside of it, until the topology is connected.
+    """
+    while not nx.is_connected(topology):
+        component = np.array(sorted(min(nx.connected_components(topology), key=len)))
+        outside = np.setdiff1d(np.arange(len(pos)), component)
+        distances = np.linalg.norm(pos[component, None, :] - pos[None, outside, :], axis=2)
+        i, j = np.unravel_index(np.argmin(distances), distances.shape)
+        topology.add_edge(int(component[i]), int(outside[j]))
+
+
+def generate_random_topology(num_nodes, degree, rng):
+    """
+    Places the nodes uniformly at random and links each node to its nearest nodes, shortest links first,
+    until the average node degree is reached.
+    """
+    pos = np.column_stack([rng.uniform(*AREA[0], num_nodes), rng.uniform(*AREA[1], num_nodes)])
+    topology = nx.Graph()
+    topology.add_nodes_from(range(num_nodes))
+    neighbours = _nearest_neighbours(pos, int(np.ceil(degree)) + 1)
+    candidates = [(np.linalg.norm(pos[n1] - pos[n2]), min(n1, n2), max(n1, n2))
+                  for n1 in range(num_nodes) for n2 in neighbours[n1].tolist()]
+    num_links = int(round(num_nodes * degree / 2))
+    for _, n1, n2 in sorted(candidates):
+        if topology.number_of_edges() >= num_links:
+            break
+        topology.add_edge(n1, n2)
+    _connect_components(topology, pos)
+    return topology, pos
+
+
+def generate_grid_topology(num_nodes, degree, rng):
+    """
+    Places the nodes in a slightly perturbed grid, each linked to the nodes next to it (degree close to 4),
+    and adds diagonal links at random to reach higher average degrees (up to close to 8).
+    """
+    cols = int(np.ceil(np.sqrt(num_nodes)))
+    rows = int(np.ceil(num_nodes / cols))
+    cell = np.array([(AREA[0][1] - AREA[0][0]) / cols, (AREA[1][1] - AREA[1][0]) / rows])
+    node = np.arange(num_nodes)
+    pos = np.column_stack([AREA[0][0] + (node % cols + 0.5) * cell[0], AREA[1][0] + (node // cols + 0.5) * cell[1]])
+    pos += rng.uniform(-0.25, 0.25, pos.shape) * cell
+    diagonal_probability = min(max((degree - 4) / 4, 0.0), 1.0)
+    topology = nx.Graph()
+    topology.add_nodes_from(range(num_nodes))
+    for n in range(num_nodes):
+        col = n % cols
+        if col + 1 < cols and n + 1 < num_nodes:
+            topology.add_edge(n, n + 1)
+        if n + cols < num_nodes:
+            topology.add_edge(n, n + cols)
+        for diagonal in (n + cols + 1, n + cols - 1):
+            if diagonal < num_nodes and abs(diagonal % cols - col) == 1 and rng.random() < diagonal_probability:
+                topology.add_edge(n, diagonal)
+    _connect_components(topology, pos)  # the last row may be incomplete
+    return topology, pos
+
+
+def place_dcs(topology, pos, num_dcs):
+    """
+    Picks `num_dcs` nodes spread over the topology (each the farthest from the ones already picked) and links
+    them to their nearest nodes until they are the nodes with the highest degree, so that running with
+    `--dc_placement degree -d num_dcs` places the DCs on them.
+    Returns the DC nodes.
+    """
+    dcs = [int(np.argmin(np.linalg.norm(pos - pos.mean(axis=0), axis=1)))]
+    distances = np.linalg.norm(pos - pos[dcs[0]], axis=1)
+    while len(dcs) < num_dcs:
+        dcs.append(int(np.argmax(distances)))
+        distances = np.minimum(distances, np.linalg.norm(pos - pos[dcs[-1]], axis=1))
+    others = np.setdiff1d(np.arange(len(pos)), dcs)
+    changed = True
+    while changed:  # linking a DC also increases the degree of other nodes
+        changed = False
+        max_degree = max(degree for _, degree in topology.degree(others.tolist()))
+        for dc in dcs:
+            for node in np.argsort(np.linalg.norm(pos - pos[dc], axis=1), kind='stable').tolist():
+                if topology.degree(dc) > max_degree:
+                    break
+                if node != dc and node not in dcs and not topology.has_edge(dc, node):
+                    topology.add_edge(dc, node)
+                    changed = True
+    return dcs
+
+
+def generate_disaster_zones(topology, pos, num_zones, zone_radius, rng):
+    """
+    Generates `num_zones` concentric disaster zones, each centered at the middle of a random link.
+    Links are assigned to the region given by the distance of their middle point to the center,
+    in steps of `zone_radius`, and links farther than the last region are not part of the zone.
+    Returns the zones as lists of regions, each a list of (link, probability) tuples.
+    """
+    links = list(topology.edges())
+    middles = np.array([(pos[n1] + pos[n2]) / 2 for n1, n2 in links])
+    zones = []
+    for center in rng.choice(len(links), size=min(num_zones, len(links)), replace=False).tolist():
+        region_of_link = (np.linalg.norm(middles - middles[center], axis=1) // zone_radius).astype(np.int64)
+        zones.append([[(links[link], probability) for link in np.flatnonzero(region_of_link == region).tolist()]
+                      for region, probability in enumerate(ZONE_PROBABILITIES)])
+    return zones
+
+
+def write_sndlib_topology(file, topology, pos, zones):
+    """
+    Writes the topology and its disaster zones as an SNDlib XML file.
+    """
+    network = ET.Element('network', version='1.0')
+    structure = ET.SubElement(network, 'networkStructure')
+    nodes = ET.SubElement(structure, 'nodes', coordinatesType='geographical')
+    for node in topology.nodes():
+        coordinates = ET.SubElement(ET.SubElement(nodes, 'node', id=f'N{node + 1}'), 'coordinates')
+        ET.SubElement(coordinates, 'x').text = f'{pos[node][0]:.4f}'
+        ET.SubElement(coordinates, 'y').text = f'{pos[node][1]:.4f}'
+    links = ET.SubElement(structure, 'links')
+    link_ids = {}
+    for idx, (n1, n2) in enumerate(sorted(tuple(sorted(link)) for link in topology.edges())):
+        link_ids[n1, n2] = link_ids[n2, n1] = f'L{idx + 1}'
+        link = ET.SubElement(links, 'link', id=link_ids[n1, n2])
+        ET.SubElement(link, 'source').text = f'N{n1 + 1}'
+        ET.SubElement(link, 'target').text = f'N{n2 + 1}'
+    disaster_zones = ET.SubElement(network, 'disaster_zones')
+    for idz, zone in enumerate(zones):
+        zone_element = ET.SubElement(disaster_zones, 'zone', id=f'Z{idz + 1}')
+        for idr, region in enumerate(zone):
+            region_element = ET.SubElement(zone_element, 'region', id=f'R{idr}')
+            for link, probability in region:
+                ET.SubElement(region_element, 'disaster_link', probability=str(probability)).text = link_ids[link]
+    tree = ET.ElementTree(network)
+    ET.indent(tree, space=' ')
+    tree.write(file, encoding='ISO-8859-1', xml_declaration=True)
+
+
+def generate_topology(args):
+    """
+    Generates a topology as configured by `args` and writes it to `config/topologies`.
+    Returns the path of the file written.
+    """
+    if args.num_nodes <= args.num_dcs:
+        raise ValueError('The topology needs more nodes than DCs')
+    rng = np.random.default_rng(args.seed)
+    if args.kind == 'random':
+        topology, pos = generate_random_topology(args.num_nodes, args.degree, rng)
+    elif args.kind == 'grid':
+        topology, pos = generate_grid_topology(args.num_nodes, args.degree, rng)
+    else:
+        raise ValueError(f'Topology kind `{args.kind}` is unknown')
+    dcs = place_dcs(topology, pos, args.num_dcs)
+    zone_radius = args.zone_radius
+    if zone_radius is None:  # by default, half of the average link length
+        zone_radius = np.mean([np.linalg.norm(pos[n1] - pos[n2]) for n1, n2 in topology.edges()]) / 2
+    zones = generate_disaster_zones(topology, pos, args.num_zones, zone_radius, rng)
+
+    file_name = args.output if args.output is not None else f'synthetic_{args.kind}_{args.num_nodes}.xml'
+    path = os.path.join('config/topologies', file_name)
+    write_sndlib_topology(path, topology, pos, zones)
+    print(f'{path}: {topology.number_of_nodes()} nodes, {topology.number_of_edges()} links, '
+          f'average degree {2 * topology.number_of_edges() / topology.number_of_nodes():.2f}, '
+          f'{len(zones)} zones, DCs {[f"N{dc + 1}" for dc in dcs]}')
+    return path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--num_nodes', type=int, default=500,
+                        help='Number of nodes of the topology (default=500)')
+    parser.add_argument('--kind', default='random', choices=['random', 'grid'],
+                        help='Random geographic topology or grid-like topology (default=random)')
+    parser.add_argument('--degree', type=float, default=3.0,
+                        help='Average node degree, before linking the DCs (default=3.0)')
+    parser.add_argument('-d', '--num_dcs', type=int, default=3,
+                        help='Number of DCs, placed with --dc_placement degree (default=3)')
+    parser.add_argument('-z', '--num_zones', type=int, default=20,
+                        help='Number of disaster zones (default=20)')
+    parser.add_argument('--zone_radius', type=float, default=None,
+                        help='Width of each region of the disaster zones, in degrees (default=half of the average link length)')
+    parser.add_argument('-s', '--seed', type=int, default=42,
+                        help='Seed of the random numbers (default=42)')
+    parser.add_argument('-o', '--output', default=None,
+                        help='Name of the file written to config/topologies (default=synthetic_<kind>_<num_nodes>.xml)')
+    generate_topology(parser.parse_args())
@@ -0,0 +1,74 @@
+"""
+Tracing of the simulation, for debugging.
+Messages belong to a category, and each category is switched on and off separately.
+Callers check the switch of the category before building the message, e.g.:
+
+    if tracing.routing:
+        tracing.emit('routing', f'Lowest risk: {lowest_risk}')
+
+so a disabled category costs a single attribute lookup, and messages are never formatted.
+Messages of enabled categories are logged at debug level and kept in a ring buffer,
+which can be dumped after a failure with `dump`.
+"""
+import collections
+import logging
+import sys
+from typing import Deque, Optional, Sequence, Tuple
+
+CATEGORIES = ('routing', 'restoration', 'disaster', 'ksp')
+
+# switches of the categories, all disabled by default
+routing: bool = False  # choice of paths and DCs for arrivals
+restoration: bool = False  # restoration and relocation of disrupted services
+disaster: bool = False  # disaster zones, epicenters and cascades
+ksp: bool = False  # DC placement and path tables
+
+_logger = logging.getLogger('tracing')
+_buffer: Deque[Tuple[str, str]] = collections.deque(maxlen=10000)
+
+
+def configure(categories: Sequence[str] = (), buffer_size: int = 10000) -> None:
+    """
+    Enables the given categories (or all of them, with 'all') and disables the others.
+    The ring buffer keeps the last `buffer_size` messages.
+    """
+    global _buffer
+    if 'all' in categories:
+        categories = CATEGORIES
+    for category in categories:
+        if category not in CATEGORIES:
+            raise ValueError(f'Trace category `{category}` is unknown')
+    for category in CATEGORIES:
+        globals()[category] = category in categories
+    _logger.setLevel(logging.DEBUG if len(categories) > 0 else logging.NOTSET)
+    _buffer = collections.deque(maxlen=buffer_size)
+
+
+def get_categories() -> Tuple[str, ...]:
+    """
+    Returns the enabled categories, e.g., to enable the same ones in the worker processes.
+    """
+    return tuple(category for category in CATEGORIES if globals()[category])
+
+
+def emit(category: str, message: str) -> None:
+    """
+    Records a message of an enabled category.
+    """
+    _buffer.append((category, message))
+    _logger.debug('%s\t%s', category, message)
+
+
+def dump(file_name: Optional[str] = None) -> None:
+    """
+    Writes the messages kept in the ring buffer, oldest first, to a file or to stderr.
+    """
+    if len(_buffer) == 0:
+        return
+    file = open(file_name, 'wt') if file_name is not None else sys.stderr
+    try:
+        for category, message in _buffer:
+            file.write(f'{category}\t{message}\n')
+    finally:
+        if file_name is not None:
+            file.close()
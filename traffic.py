@@ -0,0 +1,47 @@
+from typing import List, Sequence, Tuple
+import numpy as np
+
+
+class TrafficGenerator:
+    """
+    Seeded generator of the service requests of a simulation.
+    Inter-arrival times, holding times, sources and computing units are drawn in blocks of `block_size`
+    values, and a new block is drawn only when the previous one is used up.
+
+    Each quantity has its own stream spawned from the seed, so the sequence of requests depends only
+    on the seed, and not on the block size, on the other random draws of the simulation or on how many
+    simulations run in parallel.
+    """
+
+    def __init__(self, seed: int, source_ids: Sequence[int], block_size: int = 65536):
+        self.source_ids: np.ndarray = np.asarray(source_ids, dtype=np.int64)
+        self.block_size: int = block_size
+        self._inter_arrival_rng, self._holding_rng, self._source_rng, self._units_rng = \
+            [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(4)]
+        self._position: int = block_size  # forces drawing the first block
+        self._inter_arrival_times: List[float] = []
+        self._holding_times: List[float] = []
+        self._sources: List[int] = []
+        self._computing_units: List[int] = []
+
+    def _draw_block(self) -> None:
+        # blocks are converted to lists, as indexing them is faster than indexing arrays
+        self._inter_arrival_times = self._inter_arrival_rng.standard_exponential(self.block_size).tolist()
+        self._holding_times = self._holding_rng.standard_exponential(self.block_size).tolist()
+        self._sources = self.source_ids[self._source_rng.integers(0, len(self.source_ids), self.block_size)].tolist()
+        self._computing_units = self._units_rng.integers(1, 6, self.block_size).tolist()  # from 1 to 5 units
+        self._position = 0
+
+    def next_request(self, mean_inter_arrival_time: float, mean_holding_time: float) -> Tuple[float, float, int, int]:
+        """
+        Returns the inter-arrival time, holding time, source index and computing units of the next request.
+        The times are exponentially distributed with the given means.
+        """
+        if self._position == self.block_size:
+            self._draw_block()
+        i = self._position
+        self._position += 1
+        return (self._inter_arrival_times[i] * mean_inter_arrival_time,
+                self._holding_times[i] * mean_holding_time,
+                self._sources[i],
+                self._computing_units[i])